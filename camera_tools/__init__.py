@@ -2,13 +2,23 @@ import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
-from .camera import Camera
+from .camera import Camera, CameraInfo, CameraCapabilities, FrameBatch, AcquisitionStats, frame_dtype
+from .frame_pool import FramePool
+from .frame_pacer import FramePacer
+from .latency import LatencyHistogram
+from .frame_iterator import FrameIterator
+from .async_acquisition import AsyncFrameIterator
+from .shared_frame_ring import SharedMemoryFrameRing
+from .camera_wrapper import CameraWrapper
+from .latest_frame import LatestFrameCamera, LatestFrameGrabber
+from .discovery import discover_cameras, iter_discover_cameras, clear_discovery_cache
 from .calibration import get_camera_distortion, get_camera_px_per_mm
 from .randomcam import RandomCam
 from .zerocam import ZeroCam
 from .ROI_sensor_widget import CameraSensorROI
 from .moviefilecam import *
 from .webcam import *
+from .mjpeg_decoder import MJPEGDecoder
 
 try:
     from .aravis import AravisCamera
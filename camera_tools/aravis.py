@@ -1,7 +1,8 @@
-from camera_tools.camera import Camera, CameraInfo
-from typing import Optional, Tuple, List
+from camera_tools.camera import Camera, CameraInfo, frame_dtype
+from typing import Optional, Tuple, List, Callable, Dict, Any
 from numpy.typing import NDArray
 import numpy as np
+import time
 
 import gi
 gi.require_version ('Aravis', '0.10')
@@ -11,8 +12,26 @@ from gi.repository import Aravis
 
 class AravisCamera(Camera):
 
+    # Aravis' simulated GenICam device, available without hardware
+    FAKE_INTERFACE: str = "Fake"
+    FAKE_DEVICE_ID: str = "Fake_1"
+
+    SETTINGS = Camera.SETTINGS + ('pixel_format', 'binning')
+    PIXEL_FORMATS = {
+        'Mono8': np.uint8,
+        'Mono10': np.uint16,
+        'Mono12': np.uint16,
+        'Mono16': np.uint16
+    }
+
     @classmethod
-    def list_available_cameras(cls) -> List[CameraInfo]:
+    def enable_fake_camera(cls) -> None:
+        Aravis.enable_interface(cls.FAKE_INTERFACE)
+
+    @classmethod
+    def list_available_cameras(cls, include_fake: bool = False) -> List[CameraInfo]:
+        if include_fake:
+            cls.enable_fake_camera()
         Aravis.update_device_list()
         
         cam_info = []
@@ -27,7 +46,7 @@ class AravisCamera(Camera):
             cam_info.append(cam)
         return cam_info
     
-    def __init__(self, dev_id: Optional[str] = None, *args, **kwargs):
+    def __init__(self, dev_id: Optional[str] = None, num_buffers: int = 5, *args, **kwargs):
 
         super().__init__(*args, **kwargs)
         
@@ -35,28 +54,55 @@ class AravisCamera(Camera):
         self.first_frame = True
         self.first_num = 0
         self.first_timestamp = 0
-        self.num_buffers = 5
+        self.num_buffers = num_buffers
+        self.pixel_dtype = np.uint8
         self.acquisition_started = False
         self.stream = None
+        self.frame_callback = None
+        self.frame_callback_id = None
         
         # open camera
+        if self.is_fake():
+            self.enable_fake_camera()
         self.cam = Aravis.Camera.new(dev_id)
 
         # basic config
         self.cam.set_acquisition_mode(Aravis.AcquisitionMode.CONTINUOUS)
-        self.cam.set_frame_rate_enable(True)
-        self.cam.set_exposure_time_auto(Aravis.Auto.OFF)
-        self.cam.set_exposure_mode(Aravis.ExposureMode.TIMED)
-        self.cam.set_gain_auto(Aravis.Auto.OFF)
         self.cam.set_pixel_format(Aravis.PIXEL_FORMAT_MONO_8)
-        self.cam.set_binning(dx=1, dy=1)    
+        # optional features, e.g. the fake camera has no auto exposure
+        self._configure('frame rate enable', self.cam.set_frame_rate_enable, True)
+        self._configure('exposure auto', self.cam.set_exposure_time_auto, Aravis.Auto.OFF)
+        self._configure('exposure mode', self.cam.set_exposure_mode, Aravis.ExposureMode.TIMED)
+        self._configure('gain auto', self.cam.set_gain_auto, Aravis.Auto.OFF)
+        self._configure('binning', self.cam.set_binning, 1, 1)
 
         self.reallocate_buffers() 
 
+    def _configure(self, name: str, setter: Callable, *args) -> None:
+        try:
+            setter(*args)
+        except Exception as e:
+            print(f"Could not set {name}: {e}")
+
+    def is_fake(self) -> bool:
+        return self.dev_id is not None and self.dev_id.startswith(self.FAKE_INTERFACE)
+
+    def get_stream_statistics(self) -> Optional[Tuple[int,int,int]]:
+        '''
+        Completed buffers, failures and underruns (no buffer available
+        when a frame arrived) counted by the stream since its creation
+        '''
+        if self.stream is None:
+            return None
+        return tuple(self.stream.get_statistics())
+
     def reallocate_buffers(self) -> None:
         payload = self.cam.get_payload()
         
+        # the frame callback follows the stream
+        callback = self.frame_callback
         if self.stream is not None:
+            self._disconnect_frame_callback()
             self.stream.delete_buffers()
             self.stream = None
 
@@ -64,6 +110,24 @@ class AravisCamera(Camera):
         for i in range(self.num_buffers):
             self.stream.push_buffer(Aravis.Buffer.new_allocate(payload))
 
+        if callback is not None:
+            self._connect_frame_callback(callback)
+
+    def _connect_frame_callback(self, callback: Callable[[], None]) -> bool:
+        # new-buffer is emitted from the stream thread
+        self._disconnect_frame_callback()
+        self.stream.set_emit_signals(True)
+        self.frame_callback = callback
+        self.frame_callback_id = self.stream.connect('new-buffer', lambda stream: callback())
+        return True
+
+    def _disconnect_frame_callback(self) -> None:
+        if self.frame_callback_id is not None and self.stream is not None:
+            self.stream.disconnect(self.frame_callback_id)
+            self.stream.set_emit_signals(False)
+        self.frame_callback = None
+        self.frame_callback_id = None
+
     def start_acquisition(self) -> None:
         if not self.acquisition_started:
             self.cam.start_acquisition()
@@ -146,20 +210,64 @@ class AravisCamera(Camera):
         return self.cam.is_region_offset_available()
     
     def set_ROI(self, left: int, bottom: int, width: int, height: int) -> None:
-        inc_x = self.get_offsetX_increment()
-        inc_y = self.get_offsetY_increment()
-        inc_w = self.get_width_increment()
-        inc_h = self.get_height_increment()
+        self._apply_ROI(left, bottom, width, height)
+        self.reallocate_buffers()
 
-        a_left = self._align_value(left, inc_x)
-        a_bottom = self._align_value(bottom, inc_y)
-        a_width = self._align_value(width, inc_w)
-        a_height = self._align_value(height, inc_h)
+    def _apply_ROI(self, offsetX: int, offsetY: int, width: int, height: int) -> None:
+        capabilities = self.get_capabilities()
+
+        a_left = self._align_value(offsetX, capabilities.offsetX_increment or 1)
+        a_bottom = self._align_value(offsetY, capabilities.offsetY_increment or 1)
+        a_width = self._align_value(width, capabilities.width_increment or 1)
+        a_height = self._align_value(height, capabilities.height_increment or 1)
 
         self.cam.set_region(0, 0, a_width, a_height)
         self.cam.set_region(a_left, a_bottom, a_width, a_height)
-        
-        self.reallocate_buffers()
+        self.invalidate_capabilities('offsetX', 'offsetY', 'width', 'height', 'framerate')
+
+    def _resolve_ROI(self, settings: Dict[str, Any]) -> Dict[str, int]:
+        region = self.cam.get_region()
+        return {
+            'offsetX': settings.get('offsetX', region.x),
+            'offsetY': settings.get('offsetY', region.y),
+            'width': settings.get('width', region.width),
+            'height': settings.get('height', region.height)
+        }
+
+    def _set_pixel_format(self, pixel_format: str) -> None:
+        if pixel_format not in self.PIXEL_FORMATS:
+            raise ValueError(f'Unsupported pixel format {pixel_format}')
+        self.cam.set_pixel_format_from_string(pixel_format)
+        self.pixel_dtype = self.PIXEL_FORMATS[pixel_format]
+        self.invalidate_capabilities()
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return self.cam.get_pixel_format_as_string()
+
+    def _set_binning(self, horizontal: int, vertical: int) -> None:
+        self.cam.set_binning(dx=horizontal, dy=vertical)
+        self.invalidate_capabilities()
+
+    def _get_binning(self) -> Optional[Tuple[int, int]]:
+        return tuple(self.cam.get_binning())
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        # set_region rewrites the whole ROI, which is locked while streaming
+        relayout = any(
+            name in settings 
+            for name in self.LAYOUT_SETTINGS + ('offsetX', 'offsetY')
+        )
+        restart = relayout and self.acquisition_started
+        if restart:
+            self.stop_acquisition()
+
+        # _apply_ROI doesn't reallocate, buffers are reallocated once here
+        super()._apply_settings(settings)
+        if relayout:
+            self.reallocate_buffers()
+
+        if restart:
+            self.start_acquisition()
 
     def get_ROI(self) -> Optional[Tuple[int,int,int,int]]:
         region = self.cam.get_region()
@@ -257,33 +365,51 @@ class AravisCamera(Camera):
             inc = 1
         return inc
 
-    def get_frame(self) -> NDArray:
-
-        buffer = self.stream.pop_buffer()
+    def _buffer_to_numpy(self, buffer: Aravis.Buffer) -> NDArray:
         h = buffer.get_image_height()
         w = buffer.get_image_width()
         raw_pixeldata = buffer.get_image_data()
-        pixeldata = np.frombuffer(raw_pixeldata, np.uint8).reshape(h,w) # may need to copy
+        return np.frombuffer(raw_pixeldata, self.pixel_dtype).reshape(h,w)
+
+    def _fill_frame(self, out: NDArray, buffer: Aravis.Buffer, pixeldata: NDArray) -> NDArray:
+        host_timestamp_ns = time.perf_counter_ns()
         im_num = buffer.get_frame_id()
-        ts_nsec = buffer.get_timestamp()
-        timestamp = ts_nsec*1e-9
+        timestamp_ns = buffer.get_timestamp()
         if self.first_frame:
             self.first_frame = False
             self.first_num = im_num
-            self.first_timestamp = timestamp
-
-        frame = np.array(
-            (im_num-self.first_num, timestamp-self.first_timestamp, pixeldata),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', np.uint8, (h,w))
-            ])
+            self.first_timestamp = timestamp_ns
+
+        out['index'] = im_num-self.first_num
+        out['timestamp_ns'] = timestamp_ns-self.first_timestamp
+        out['host_timestamp_ns'] = host_timestamp_ns
+        out['image'] = pixeldata
+
+        self._update_stats(
+            im_num-self.first_num, 
+            timestamp_ns-self.first_timestamp, 
+            host_timestamp_ns,
+            incomplete = buffer.get_status() != Aravis.BufferStatus.SUCCESS
         )
-                
+        return out
+
+    def get_frame(self) -> NDArray:
+
+        buffer = self.stream.pop_buffer()
+        pixeldata = self._buffer_to_numpy(buffer) 
+        frame = self._new_frame(frame_dtype(self.pixel_dtype, pixeldata.shape))
+        self._fill_frame(frame, buffer, pixeldata)
         self.stream.push_buffer(buffer)
         return frame
 
+    def get_frame_into(self, out: NDArray) -> NDArray:
+
+        # the buffer is only pushed back once pixels are copied to out
+        buffer = self.stream.pop_buffer()
+        self._fill_frame(out, buffer, self._buffer_to_numpy(buffer))
+        self.stream.push_buffer(buffer)
+        return out
+
     def get_num_channels(self) -> int:
         return 1
     
@@ -292,6 +418,7 @@ class AravisCamera(Camera):
             self.stop_acquisition()
         self.stream = None
         self.cam = None
+        super().close()
 
     def __del__(self) -> None:
         try:
@@ -0,0 +1,191 @@
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional, Callable, TYPE_CHECKING
+from camera_tools.frame_pool import FramePool
+from camera_tools.frame_iterator import acquire_into_pool
+
+if TYPE_CHECKING:
+    from camera_tools.camera import Camera
+
+POLL_INTERVAL: float = 0.1
+
+def _put(
+        frames: asyncio.Queue, 
+        loop: asyncio.AbstractEventLoop, 
+        stop_event: threading.Event, 
+        frame: NDArray
+    ) -> bool:
+    # waits on a full queue, but gives up once stopped or the loop is gone
+    future = asyncio.run_coroutine_threadsafe(frames.put(frame), loop)
+    while True:
+        try:
+            future.result(timeout=POLL_INTERVAL)
+            return True
+        except concurrent.futures.TimeoutError:
+            if (stop_event.is_set() or loop.is_closed()) and future.cancel():
+                return False
+
+def _acquire(
+        camera: 'Camera', 
+        pool: FramePool, 
+        frames: asyncio.Queue, 
+        loop: asyncio.AbstractEventLoop, 
+        stop_event: threading.Event
+    ) -> None:
+    # holds no reference to the iterator, which stops the thread when it
+    # is garbage collected
+    frame = None
+    try:
+        while not stop_event.is_set():
+            frame = acquire_into_pool(camera, pool)
+            if frame is None:
+                break
+            if not _put(frames, loop, stop_event, frame):
+                pool.release(frame)
+                return
+            frame = None
+    except Exception as e:
+        frame = e
+    # signal the end of the stream or the exception to the consumer
+    if not stop_event.is_set() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(frames.put(frame), loop)
+
+def _weak_callback(method: Callable[[], None]) -> Callable[[], None]:
+    # the camera keeps its frame callback: don't let it keep the iterator 
+    # alive
+    ref = weakref.WeakMethod(method)
+    def callback() -> None:
+        bound = ref()
+        if bound is not None:
+            bound()
+    return callback
+
+def _stop(stop_event: threading.Event, camera: 'Camera', use_callback: bool) -> None:
+    stop_event.set()
+    if use_callback:
+        camera._disconnect_frame_callback()
+
+class AsyncFrameIterator:
+    '''
+    Asynchronous iterator over the frames of a camera.
+
+    Frames are acquired into a ring of preallocated frames, either from the
+    camera's native new-frame callback when it has one, or from a dedicated
+    thread. They are handed to the event loop through a queue bounded to
+    queue_size frames. The acquisition thread waits when the queue is full,
+    callbacks cannot wait and drop the oldest queued frame instead, or the
+    new frame itself while no slot of the ring is free.
+    A frame stays valid until the next iteration. Call aclose to stop 
+    acquisition, it is otherwise only stopped once the iterator is garbage
+    collected.
+    '''
+
+    def __init__(self, camera: 'Camera', queue_size: int = 2) -> None:
+
+        if queue_size < 1:
+            raise ValueError('queue_size must be at least 1')
+
+        self.camera = camera
+        self.queue_size = queue_size
+        # slots: queued frames + frame being written + frame held by consumer
+        self.pool = FramePool(queue_size + 2)
+        self.loop = None
+        self.queue = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.use_callback = False
+        self.closed = False
+        self.current = None
+        # only updated on the event loop
+        self.num_dropped = 0
+        self._finalizer = None
+
+    def __aiter__(self) -> 'AsyncFrameIterator':
+        return self
+
+    async def __anext__(self) -> NDArray:
+
+        if self.closed:
+            raise StopAsyncIteration
+
+        if self.queue is None:
+            self._start()
+
+        if self.current is not None:
+            self.pool.release(self.current)
+            self.current = None
+
+        frame = await self.queue.get()
+        if isinstance(frame, BaseException):
+            await self.aclose()
+            raise frame
+        if frame is None:
+            await self.aclose()
+            raise StopAsyncIteration
+        self.current = frame
+        return frame
+
+    def _start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.stop_event.clear()
+        self.use_callback = self.camera._connect_frame_callback(_weak_callback(self._on_new_frame))
+        self._finalizer = weakref.finalize(self, _stop, self.stop_event, self.camera, self.use_callback)
+        if not self.use_callback:
+            self.thread = threading.Thread(
+                target = _acquire,
+                args = (self.camera, self.pool, self.queue, self.loop, self.stop_event),
+                daemon = True
+            )
+            self.thread.start()
+
+    def _put_nowait(self, frame: Optional[NDArray]) -> None:
+        # runs on the event loop
+        if self.queue.full():
+            dropped = self.queue.get_nowait()
+            if isinstance(dropped, np.ndarray):
+                self.pool.release(dropped)
+            self.num_dropped += 1
+        self.queue.put_nowait(frame)
+
+    def _count_dropped(self) -> None:
+        # runs on the event loop
+        self.num_dropped += 1
+
+    def _on_new_frame(self) -> None:
+        # called from the driver's thread
+        if self.stop_event.is_set():
+            return
+        try:
+            if self.pool.frames is not None and self.pool.num_leased() == self.pool.num_frames:
+                # every slot is queued or held by the consumer, and frames
+                # already scheduled for the queue are not dropped yet: 
+                # take the frame from the driver and discard it rather 
+                # than recycle a slot still in use
+                frame = self.camera.get_frame()
+                if frame is not None:
+                    self.camera.release_frame(frame)
+                    self.loop.call_soon_threadsafe(self._count_dropped)
+                return
+            frame = acquire_into_pool(self.camera, self.pool)
+        except Exception as e:
+            frame = e
+        self.loop.call_soon_threadsafe(self._put_nowait, frame)
+
+    async def aclose(self) -> None:
+        self.closed = True
+        if self._finalizer is not None:
+            # stops the thread or disconnects the callback
+            self._finalizer()
+        self.use_callback = False
+
+        if self.thread is not None:
+            # unblock the acquisition thread if it waits on a full queue
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            await asyncio.get_running_loop().run_in_executor(None, self.thread.join)
+            self.thread = None
@@ -0,0 +1,3 @@
+from .core import BenchmarkResult, benchmark_camera, measure_allocations, unthrottle
+from .backends import SIMULATED_BACKENDS, HARDWARE_BACKENDS, available_hardware_backends, configurations, UnsupportedConfiguration
+from .suite import run_suite
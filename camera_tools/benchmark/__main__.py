@@ -0,0 +1,58 @@
+import argparse
+import json
+import sys
+from camera_tools.benchmark.backends import SIMULATED_BACKENDS, HARDWARE_BACKENDS, available_hardware_backends
+from camera_tools.benchmark.suite import run_suite
+
+def parse_resolution(text: str):
+    try:
+        width, height = (int(x) for x in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid resolution {text}, expected WIDTHxHEIGHT')
+    return width, height
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark camera acquisition throughput and latency")
+    parser.add_argument("--backends", nargs="+", default=list(SIMULATED_BACKENDS), help="Backends to benchmark")
+    parser.add_argument("--hardware", action="store_true", help="Also benchmark hardware backends that find a camera")
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=[(640, 480), (2048, 2048)], help="WIDTHxHEIGHT")
+    parser.add_argument("--dtypes", nargs="+", default=["uint8", "float32"], help="Image dtypes of simulated cameras")
+    parser.add_argument("--channels", nargs="+", type=int, default=[1, 3], help="Channel counts of simulated cameras")
+    parser.add_argument("--frames", type=int, default=500, help="Number of timed frames per configuration")
+    parser.add_argument("--warmup", type=int, default=20, help="Number of frames acquired before timing")
+    parser.add_argument("--alloc-frames", type=int, default=50, help="Number of frames traced for allocations")
+    parser.add_argument("--workdir", default=None, help="Where to keep generated test videos (default: temporary)")
+    parser.add_argument("-o", "--output", default=None, help="JSON output file (default: stdout)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    args = parse_arguments()
+
+    backends = list(args.backends)
+    for backend in backends:
+        if backend not in SIMULATED_BACKENDS and backend not in HARDWARE_BACKENDS:
+            print(f"Error: unknown backend {backend}", file=sys.stderr)
+            sys.exit(1)
+
+    if args.hardware:
+        backends += [b for b in available_hardware_backends() if b not in backends]
+
+    report = run_suite(
+        backends = backends,
+        resolutions = args.resolutions,
+        dtypes = args.dtypes,
+        channels = args.channels,
+        num_frames = args.frames,
+        warmup = args.warmup,
+        alloc_frames = args.alloc_frames,
+        workdir = args.workdir,
+        verbose = args.output is not None
+    )
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,128 @@
+import argparse
+import json
+import sys
+import time
+from typing import List, Tuple, Dict, Any
+import numpy as np
+from camera_tools.benchmark.core import benchmark_camera
+
+def open_fake_camera(num_buffers: int = 5):
+    from camera_tools.aravis import AravisCamera
+    return AravisCamera(dev_id=AravisCamera.FAKE_DEVICE_ID, num_buffers=num_buffers)
+
+def time_calls(fun, repeat: int) -> Dict[str, float]:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        fun()
+        durations.append(time.perf_counter_ns() - start)
+    return {
+        'mean_us': float(np.mean(durations)) / 1000,
+        'max_us': float(np.max(durations)) / 1000
+    }
+
+def bench_reallocate_buffers(num_buffers: List[int], repeat: int = 20) -> List[Dict[str, Any]]:
+    results = []
+    for n in num_buffers:
+        camera = open_fake_camera(n)
+        try:
+            results.append({'num_buffers': n, **time_calls(camera.reallocate_buffers, repeat)})
+        finally:
+            camera.close()
+    return results
+
+def bench_roi_changes(resolutions: List[Tuple[int, int]], repeat: int = 10) -> List[Dict[str, Any]]:
+    '''
+    Time set_ROI, which reallocates the stream buffers, and the first
+    frame acquired after the change
+    '''
+    results = []
+    camera = open_fake_camera()
+    try:
+        for width, height in resolutions:
+            def change_roi():
+                camera.set_ROI(0, 0, width, height)
+                camera.start_acquisition()
+                camera.get_frame()
+                camera.stop_acquisition()
+            results.append({'width': width, 'height': height, **time_calls(change_roi, repeat)})
+    finally:
+        camera.close()
+    return results
+
+def bench_throughput(
+        resolutions: List[Tuple[int, int]],
+        num_frames: int = 500
+    ) -> List[Dict[str, Any]]:
+    results = []
+    for width, height in resolutions:
+        camera = open_fake_camera()
+        camera.set_ROI(0, 0, width, height)
+        result = benchmark_camera(camera, 'AravisFake', {'width': width, 'height': height}, num_frames)
+        results.append(result.to_dict())
+    return results
+
+def bench_starvation(
+        num_buffers: List[int],
+        consumer_delay_s: float = 0.02,
+        framerate: float = 100,
+        num_frames: int = 100
+    ) -> List[Dict[str, Any]]:
+    '''
+    Consume frames slower than the camera produces them and report how many
+    frames are lost for each number of stream buffers
+    '''
+    results = []
+    for n in num_buffers:
+        camera = open_fake_camera(n)
+        try:
+            camera.set_framerate(framerate)
+            camera.reset_acquisition_stats()
+            camera.start_acquisition()
+            for _ in range(num_frames):
+                camera.release_frame(camera.get_frame())
+                time.sleep(consumer_delay_s)
+            camera.stop_acquisition()
+            stats = camera.get_acquisition_stats()
+            completed, failures, underruns = camera.get_stream_statistics()
+            results.append({
+                'num_buffers': n,
+                'delivered': stats.delivered,
+                'dropped': stats.dropped,
+                'late': stats.late,
+                'stream_failures': failures,
+                'stream_underruns': underruns
+            })
+        finally:
+            camera.close()
+    return results
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    width, height = (int(x) for x in text.lower().split('x'))
+    return width, height
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark AravisCamera offline with Aravis' fake GenICam device")
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=[(512, 512), (2048, 2048)], help="WIDTHxHEIGHT")
+    parser.add_argument("--buffers", nargs="+", type=int, default=[2, 5, 10, 20], help="Stream buffer counts")
+    parser.add_argument("--frames", type=int, default=500, help="Number of timed frames per resolution")
+    parser.add_argument("-o", "--output", default=None, help="JSON output file (default: stdout)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+
+    args = parse_arguments()
+
+    report = {
+        'throughput': bench_throughput(args.resolutions, args.frames),
+        'reallocate_buffers': bench_reallocate_buffers(args.buffers),
+        'roi_changes': bench_roi_changes(args.resolutions),
+        'starvation': bench_starvation(args.buffers),
+    }
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,143 @@
+import importlib
+import itertools
+import os
+import numpy as np
+from typing import Optional, Tuple, List, Dict, Any, Callable, Iterator
+from camera_tools.camera import Camera
+
+class UnsupportedConfiguration(ValueError):
+    pass
+
+# Each factory gets (height, width, num_channels, dtype, workdir) and returns
+# a camera, or raises UnsupportedConfiguration for configurations the backend
+# cannot produce
+
+def make_zerocam(height: int, width: int, num_channels: int, dtype: str, workdir: str) -> Camera:
+    from camera_tools.zerocam import ZeroCam
+    shape = (height, width) if num_channels == 1 else (height, width, num_channels)
+    return ZeroCam(shape=shape, dtype=np.dtype(dtype))
+
+def make_randomcam(height: int, width: int, num_channels: int, dtype: str, workdir: str) -> Camera:
+    from camera_tools.randomcam import RandomCam
+    shape = (height, width) if num_channels == 1 else (height, width, num_channels)
+    return RandomCam(shape=shape, dtype=np.dtype(dtype))
+
+def write_test_video(
+        filename: str,
+        height: int,
+        width: int,
+        num_frames: int = 120,
+        fps: float = 60
+    ) -> str:
+    '''
+    Write a noise video to use as a source for movie file cameras,
+    skipped if the file already exists
+    '''
+    import cv2
+
+    if os.path.isfile(filename):
+        return filename
+
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for _ in range(num_frames):
+        writer.write(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    writer.release()
+    return filename
+
+def _movie_video(
+        backend: str,
+        height: int,
+        width: int,
+        num_channels: int,
+        dtype: str,
+        workdir: str,
+        supported_channels: Tuple[int, ...]
+    ) -> str:
+    if np.dtype(dtype) != np.uint8:
+        raise UnsupportedConfiguration(f'{backend} only provides uint8 frames')
+    if num_channels not in supported_channels:
+        raise UnsupportedConfiguration(f'{backend} provides {supported_channels} channels')
+    return write_test_video(os.path.join(workdir, f'benchmark_{width}x{height}.mp4'), height, width)
+
+def make_moviefilecam(height: int, width: int, num_channels: int, dtype: str, workdir: str) -> Camera:
+    filename = _movie_video('MovieFileCam', height, width, num_channels, dtype, workdir, (3,))
+    from camera_tools.moviefilecam import MovieFileCam
+    return MovieFileCam(filename=filename, loop=True)
+
+def make_moviefilecam_gray(height: int, width: int, num_channels: int, dtype: str, workdir: str) -> Camera:
+    filename = _movie_video('MovieFileCamGray', height, width, num_channels, dtype, workdir, (1,))
+    from camera_tools.moviefilecam import MovieFileCamGray
+    return MovieFileCamGray(filename=filename, loop=True)
+
+def make_buffered_moviefilecam(height: int, width: int, num_channels: int, dtype: str, workdir: str) -> Camera:
+    filename = _movie_video('BufferedMovieFileCam', height, width, num_channels, dtype, workdir, (1, 3))
+    from camera_tools.moviefilecam import BufferedMovieFileCam
+    return BufferedMovieFileCam(filename=filename, grayscale=(num_channels == 1))
+
+SIMULATED_BACKENDS: Dict[str, Callable[..., Camera]] = {
+    'ZeroCam': make_zerocam,
+    'RandomCam': make_randomcam,
+    'MovieFileCam': make_moviefilecam,
+    'MovieFileCamGray': make_moviefilecam_gray,
+    'BufferedMovieFileCam': make_buffered_moviefilecam,
+}
+
+# hardware cameras are benchmarked at their native format, resized to the
+# requested resolution when they support it
+HARDWARE_BACKENDS: Dict[str, Tuple[str, str]] = {
+    'AravisCamera': ('camera_tools.aravis', 'AravisCamera'),
+    'XimeaCamera': ('camera_tools.ximeacam', 'XimeaCamera'),
+    'SpinnakerCamera': ('camera_tools.spinnaker', 'SpinnakerCamera'),
+    'OpenCV_Webcam': ('camera_tools.webcam', 'OpenCV_Webcam'),
+}
+
+def available_hardware_backends() -> List[str]:
+    '''
+    Hardware backends that import and see at least one camera
+    '''
+    available = []
+    for name, (module, cls_name) in HARDWARE_BACKENDS.items():
+        try:
+            camera_cls = getattr(importlib.import_module(module), cls_name)
+            if camera_cls.list_available_cameras():
+                available.append(name)
+        except Exception:
+            pass
+    return available
+
+def make_hardware_camera(name: str, height: int, width: int) -> Camera:
+    module, cls_name = HARDWARE_BACKENDS[name]
+    camera_cls = getattr(importlib.import_module(module), cls_name)
+    camera = camera_cls.list_available_cameras()[0].instantiate()
+    if camera.width_available() and camera.height_available():
+        camera.set_width(width)
+        camera.set_height(height)
+    return camera
+
+def configurations(
+        backends: List[str],
+        resolutions: List[Tuple[int, int]],
+        dtypes: List[str],
+        channels: List[int],
+        workdir: str
+    ) -> Iterator[Tuple[str, Dict[str, Any], Optional[Callable[[], Camera]]]]:
+    '''
+    Yield (backend, config, factory) for every point of the sweep. Hardware
+    backends ignore dtypes and channels.
+    '''
+
+    for backend in backends:
+
+        if backend in HARDWARE_BACKENDS:
+            for width, height in resolutions:
+                config = {'width': width, 'height': height}
+                yield backend, config, lambda b=backend, h=height, w=width: make_hardware_camera(b, h, w)
+            continue
+
+        factory = SIMULATED_BACKENDS[backend]
+        for (width, height), dtype, num_channels in itertools.product(resolutions, dtypes, channels):
+            config = {'width': width, 'height': height, 'dtype': dtype, 'num_channels': num_channels}
+            yield backend, config, lambda f=factory, c=config: f(
+                c['height'], c['width'], c['num_channels'], c['dtype'], workdir
+            )
@@ -0,0 +1,151 @@
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Optional, Dict, Any
+import numpy as np
+from camera_tools.camera import Camera
+
+@dataclass
+class BenchmarkResult:
+    '''
+    Outcome of benchmarking one camera configuration:
+        fps: sustained frame rate over the timed run
+        cpu_us_per_frame: process CPU time per frame, in us
+        alloc_bytes_per_frame: mean peak of transient allocations while
+            acquiring a frame (tracemalloc), close to zero when frames are
+            written into preallocated buffers. Python 3.8 can't reset 
+            the peak: only the net growth per frame is measured there
+        retained_bytes_per_frame: memory still held after the allocation run
+            divided by its number of frames, a leak if it does not go to zero
+        latency: Camera.latency_report of the timed run
+        stats: Camera.get_acquisition_stats of the timed run
+    error is set instead of the measurements when the camera failed.
+    '''
+    backend: str
+    config: Dict[str, Any] = field(default_factory=dict)
+    num_frames: int = 0
+    duration_s: Optional[float] = None
+    fps: Optional[float] = None
+    cpu_us_per_frame: Optional[float] = None
+    alloc_bytes_per_frame: Optional[float] = None
+    retained_bytes_per_frame: Optional[float] = None
+    latency: Optional[Dict[str, Dict[str, Optional[int]]]] = None
+    stats: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def unthrottle(camera: Camera) -> None:
+    '''
+    Remove frame rate pacing of simulated cameras when possible, so that
+    the benchmark measures the cost of acquisition itself
+    '''
+    if not camera.framerate_available():
+        return
+    framerate_range = camera.get_framerate_range()
+    if framerate_range is None:
+        return
+    low, high = framerate_range
+    camera.set_framerate(0 if low == 0 else high)
+
+def measure_allocations(camera: Camera, num_frames: int) -> Dict[str, float]:
+
+    per_frame_peak = []
+    frame = None
+    can_reset_peak = hasattr(tracemalloc, 'reset_peak') # Python 3.9+
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(num_frames):
+            before, _ = tracemalloc.get_traced_memory()
+            if can_reset_peak:
+                tracemalloc.reset_peak()
+            frame = camera.get_frame()
+            current, peak = tracemalloc.get_traced_memory()
+            if frame is None:
+                break
+            camera.release_frame(frame)
+            per_frame_peak.append((peak if can_reset_peak else current) - before)
+        del frame
+        end, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if not per_frame_peak:
+        return {}
+
+    return {
+        'alloc_bytes_per_frame': float(np.mean(per_frame_peak)),
+        'retained_bytes_per_frame': max(0, end - start) / len(per_frame_peak)
+    }
+
+def benchmark_camera(
+        camera: Camera,
+        backend: str,
+        config: Optional[Dict[str, Any]] = None,
+        num_frames: int = 500,
+        warmup: int = 20,
+        alloc_frames: int = 50
+    ) -> BenchmarkResult:
+    '''
+    Acquire warmup frames, then time num_frames calls to get_frame with
+    latency instrumentation, then trace allocations over alloc_frames calls.
+    Allocations are measured separately since tracing slows down Python.
+    The camera is closed at the end.
+    '''
+
+    result = BenchmarkResult(backend, dict(config or {}))
+
+    try:
+        unthrottle(camera)
+        camera.start_acquisition()
+
+        for _ in range(warmup):
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            result.config['frame_shape'] = list(frame['image'].shape)
+            result.config['frame_dtype'] = str(frame['image'].dtype)
+            camera.release_frame(frame)
+
+        camera.reset_acquisition_stats()
+        camera.enable_latency_instrumentation()
+
+        count = 0
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        for _ in range(num_frames):
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            camera.release_frame(frame)
+            count += 1
+        duration = time.perf_counter() - start
+        cpu_time = time.process_time() - cpu_start
+
+        result.latency = camera.latency_report()
+        result.stats = asdict(camera.get_acquisition_stats())
+        camera.disable_latency_instrumentation()
+
+        result.num_frames = count
+        result.duration_s = duration
+        if count > 0:
+            result.fps = count / duration
+            result.cpu_us_per_frame = 1e6 * cpu_time / count
+
+        for key, value in measure_allocations(camera, alloc_frames).items():
+            setattr(result, key, value)
+
+        camera.stop_acquisition()
+
+    except Exception as e:
+        result.error = f'{type(e).__name__}: {e}'
+
+    finally:
+        try:
+            camera.close()
+        except Exception:
+            pass
+
+    return result
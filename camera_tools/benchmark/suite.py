@@ -0,0 +1,68 @@
+import platform
+import sys
+import tempfile
+import datetime
+import numpy as np
+from typing import Optional, Tuple, List, Dict, Any
+from .core import BenchmarkResult, benchmark_camera
+from .backends import configurations, UnsupportedConfiguration
+
+def run_suite(
+        backends: List[str],
+        resolutions: List[Tuple[int, int]],
+        dtypes: List[str],
+        channels: List[int],
+        num_frames: int = 500,
+        warmup: int = 20,
+        alloc_frames: int = 50,
+        workdir: Optional[str] = None,
+        verbose: bool = False
+    ) -> Dict[str, Any]:
+    '''
+    Benchmark every backend over the product of resolutions (width, height),
+    dtypes and channel counts. Configurations a backend cannot produce are
+    skipped. Returns a JSON-serializable dict with the environment and one
+    entry per configuration.
+    '''
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+
+        for backend, config, factory in configurations(
+                backends, resolutions, dtypes, channels, workdir or tmpdir
+            ):
+
+            try:
+                camera = factory()
+            except UnsupportedConfiguration:
+                continue
+            except Exception as e:
+                result = BenchmarkResult(backend, config, error=f'{type(e).__name__}: {e}')
+            else:
+                result = benchmark_camera(camera, backend, config, num_frames, warmup, alloc_frames)
+
+            if verbose:
+                if result.error is not None:
+                    print(f'{backend} {config}: {result.error}')
+                elif result.fps is None:
+                    print(f'{backend} {config}: no frame')
+                else:
+                    print(f'{backend} {config}: {result.fps:.1f} fps, {result.cpu_us_per_frame:.1f} us/frame')
+
+            results.append(result.to_dict())
+
+    return {
+        'environment': {
+            'date': datetime.datetime.now().isoformat(),
+            'python': sys.version,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'parameters': {
+            'num_frames': num_frames,
+            'warmup': warmup,
+            'alloc_frames': alloc_frames,
+        },
+        'results': results
+    }
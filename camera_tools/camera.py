@@ -1,7 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import Optional, Tuple, List, Any, Dict, Type
-from numpy.typing import NDArray
-from dataclasses import dataclass, field
+from typing import Optional, Tuple, List, Any, Dict, Type, Callable, ClassVar, Set, Union
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import math
+from numpy.typing import NDArray, DTypeLike
+from dataclasses import dataclass, field, replace
+import numpy as np
+from .frame_pool import FramePool
+from .async_acquisition import AsyncFrameIterator
+from .frame_iterator import FrameIterator
+from .latency import LatencyRecorder
 
 @dataclass
 class CameraInfo:
@@ -13,8 +23,333 @@ class CameraInfo:
     def instantiate(self) -> 'Camera':
         return self.camera_cls(*self.args, **self.kwargs)    
  
+# pixel layouts a camera can be asked to deliver: native leaves frames as
+# the source produces them, with as few conversions as possible
+OUTPUT_FORMATS: Tuple[str, ...] = ('native', 'rgb', 'bgr', 'gray')
+
+@lru_cache(maxsize=64)
+def frame_dtype(
+        image_dtype: DTypeLike, 
+        image_shape: Tuple[int, ...], 
+        output_format: Optional[str] = None
+    ) -> np.dtype:
+    '''
+    Structured dtype of the frames returned by Camera.get_frame:
+        index: frame number
+        timestamp_ns: device (or source) clock in ns, hardware cameras count
+            from their first frame
+        host_timestamp_ns: host clock (time.perf_counter_ns) when the frame 
+            was received from the driver
+        image: pixel data
+    When known, the pixel layout of the image ('rgb', 'bgr' or 'gray') is
+    stored in the dtype metadata: frame.dtype.metadata['output_format'].
+    Results are memoized, image_shape must therefore be a tuple.
+    '''
+    fields = [
+        ('index', np.int64),
+        ('timestamp_ns', np.int64),
+        ('host_timestamp_ns', np.int64),
+        ('image', image_dtype, image_shape)
+    ]
+    if output_format is None:
+        return np.dtype(fields)
+    return np.dtype(fields, metadata={'output_format': output_format})
+
+@dataclass
+class AcquisitionStats:
+    '''
+    Acquisition health counters:
+        delivered: frames returned to the caller
+        dropped: frames missing from the sequence of frame indices
+        incomplete: frames reported incomplete by the driver
+        late: frames received by the host noticeably later than expected 
+            from the device clock, i.e. processing falls behind the sensor
+    '''
+    delivered: int = 0
+    dropped: int = 0
+    incomplete: int = 0
+    late: int = 0
+
+@dataclass(frozen=True)
+class CameraCapabilities:
+    '''
+    Snapshot of which features a camera supports, with their ranges and
+    increments (None if the feature is not available), read in one pass
+    '''
+    FEATURES: ClassVar[Tuple[str, ...]] = (
+        'exposure', 'framerate', 'gain', 'offsetX', 'offsetY', 'width', 'height'
+    )
+
+    exposure_available: bool = False
+    exposure_range: Optional[Tuple[float,float]] = None
+    exposure_increment: Optional[float] = None
+    framerate_available: bool = False
+    framerate_range: Optional[Tuple[float,float]] = None
+    framerate_increment: Optional[float] = None
+    gain_available: bool = False
+    gain_range: Optional[Tuple[float,float]] = None
+    gain_increment: Optional[float] = None
+    ROI_available: bool = False
+    offsetX_available: bool = False
+    offsetX_range: Optional[Tuple[int,int]] = None
+    offsetX_increment: Optional[int] = None
+    offsetY_available: bool = False
+    offsetY_range: Optional[Tuple[int,int]] = None
+    offsetY_increment: Optional[int] = None
+    width_available: bool = False
+    width_range: Optional[Tuple[int,int]] = None
+    width_increment: Optional[int] = None
+    height_available: bool = False
+    height_range: Optional[Tuple[int,int]] = None
+    height_increment: Optional[int] = None
+    num_channels: int = 1
+
+    @staticmethod
+    def read_feature(camera: 'Camera', feature: str) -> Dict[str, Any]:
+        available = getattr(camera, f'{feature}_available')()
+        values = {
+            f'{feature}_available': available,
+            f'{feature}_range': None,
+            f'{feature}_increment': None
+        }
+        if available:
+            values[f'{feature}_range'] = getattr(camera, f'get_{feature}_range')()
+            values[f'{feature}_increment'] = getattr(camera, f'get_{feature}_increment')()
+        return values
+
+    @classmethod
+    def from_camera(cls, camera: 'Camera') -> 'CameraCapabilities':
+        values = {
+            'ROI_available': camera.ROI_available(),
+            'num_channels': camera.get_num_channels()
+        }
+        for feature in cls.FEATURES:
+            values.update(cls.read_feature(camera, feature))
+        return cls(**values)
+
+    def refresh(self, camera: 'Camera', features: Set[str]) -> 'CameraCapabilities':
+        '''
+        Copy of the snapshot with the given features read again from camera
+        '''
+        values = {}
+        for feature in features:
+            values.update(self.read_feature(camera, feature))
+        return replace(self, **values)
+
+    def clamp(self, feature: str, value: float) -> float:
+        '''
+        Closest valid value of feature: rounded to a multiple of its 
+        increment, then clamped to its range 
+        '''
+        increment = getattr(self, f'{feature}_increment')
+        if increment:
+            value = round(value/increment)*increment
+        
+        value_range = getattr(self, f'{feature}_range')
+        if value_range is not None:
+            value = max(value_range[0], min(value_range[1], value))
+        
+        return value
+
+@dataclass
+class FrameBatch:
+    '''
+    Batch of frames stored as a contiguous (n, *image_shape) block of 
+    images with parallel index and timestamp arrays
+    '''
+    index: NDArray
+    timestamp_ns: NDArray
+    host_timestamp_ns: NDArray
+    image: NDArray
+
+    @classmethod
+    def empty(cls, num_frames: int, dtype: np.dtype) -> 'FrameBatch':
+        '''
+        Allocate a batch of num_frames frames for a frame dtype 
+        (see frame_dtype)
+        '''
+        image_dtype = dtype['image']
+        return cls(
+            index = np.empty((num_frames,), dtype=dtype['index']),
+            timestamp_ns = np.empty((num_frames,), dtype=dtype['timestamp_ns']),
+            host_timestamp_ns = np.empty((num_frames,), dtype=dtype['host_timestamp_ns']),
+            image = np.empty((num_frames, *image_dtype.shape), dtype=image_dtype.base)
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, key: slice) -> 'FrameBatch':
+        return FrameBatch(
+            self.index[key], 
+            self.timestamp_ns[key], 
+            self.host_timestamp_ns[key], 
+            self.image[key]
+        )
+
+class _FrameSlot:
+    '''
+    Row of a FrameBatch that can be passed to Camera.get_frame_into in 
+    place of a structured frame
+    '''
+
+    def __init__(self, batch: FrameBatch, position: int) -> None:
+        self.batch = batch
+        self.position = position
+
+    def __getitem__(self, name: str) -> Any:
+        return getattr(self.batch, name)[self.position]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        getattr(self.batch, name)[self.position] = value
+
 class Camera(ABC):
 
+    PREFETCH: int = 2
+    # settings accepted by apply_settings, backends supporting pixel format
+    # and binning changes extend this
+    SETTINGS: Tuple[str, ...] = (
+        'offsetX', 'offsetY', 'width', 'height', 'exposure', 'framerate', 'gain'
+    )
+    # settings changing the image layout, usually locked during acquisition
+    LAYOUT_SETTINGS: Tuple[str, ...] = ('pixel_format', 'binning', 'width', 'height')
+    LATE_THRESHOLD_NS: int = 20_000_000
+    LAG_DRIFT_NS: int = 1_000
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.frame_pool: Optional[FramePool] = None
+        self._frame_dtype: Optional[np.dtype] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._latency: Optional[LatencyRecorder] = None
+        self._capabilities: Optional[CameraCapabilities] = None
+        self._stale_capabilities: Set[str] = set()
+        Camera.reset_acquisition_stats(self)
+
+    def reset_acquisition_stats(self) -> None:
+        self._stats = AcquisitionStats()
+        self._last_index: Optional[int] = None
+        self._lag_baseline_ns: Optional[int] = None
+
+    def get_acquisition_stats(self) -> AcquisitionStats:
+        return replace(self._stats)
+
+    def enable_latency_instrumentation(self, significant_bits: int = 7) -> None:
+        '''
+        Record per-frame latencies of get_frame and get_frame_into in fixed-memory 
+        histograms, see latency_report. The methods are only wrapped while 
+        instrumentation is enabled, so that it costs nothing otherwise.
+        '''
+        if self._latency is not None:
+            self._latency.reset()
+            return
+        self._latency = LatencyRecorder(significant_bits)
+        self.get_frame = self._latency.instrument(self.get_frame)
+        self.get_frame_into = self._latency.instrument(self.get_frame_into)
+
+    def disable_latency_instrumentation(self) -> None:
+        if self._latency is None:
+            return
+        del self.get_frame
+        del self.get_frame_into
+        self._latency = None
+
+    def latency_report(self) -> Optional[Dict[str, Dict[str, Optional[int]]]]:
+        '''
+        Count, min, p50, p99, p99.9 and max in ns of each latency stage:
+            transport: device timestamp to driver return, relative to the
+                smallest value seen
+            wrapper: driver return to get_frame return
+            consumer: get_frame return to the next get_frame call
+        Returns None if instrumentation is disabled.
+        '''
+        if self._latency is None:
+            return None
+        return self._latency.report()
+
+    def _update_stats(
+            self, 
+            index: int, 
+            timestamp_ns: Optional[int] = None, 
+            host_timestamp_ns: Optional[int] = None, 
+            incomplete: bool = False
+        ) -> None:
+        '''
+        Called by backends for every frame. Device and host timestamps
+        are only needed for late frame detection: the lag between host and 
+        device clocks is compared to its running minimum, which is allowed
+        to creep up by LAG_DRIFT_NS per frame to follow clock drift.
+        '''
+
+        stats = self._stats
+        stats.delivered += 1
+        
+        if incomplete:
+            stats.incomplete += 1
+
+        if self._last_index is not None and index > self._last_index + 1:
+            stats.dropped += index - self._last_index - 1
+        self._last_index = index
+
+        if timestamp_ns is not None and host_timestamp_ns is not None:
+            lag = host_timestamp_ns - timestamp_ns
+            if self._lag_baseline_ns is None or lag < self._lag_baseline_ns:
+                self._lag_baseline_ns = lag
+            else:
+                if lag - self._lag_baseline_ns > self.LATE_THRESHOLD_NS:
+                    stats.late += 1
+                self._lag_baseline_ns += self.LAG_DRIFT_NS
+
+    def get_capabilities(self) -> CameraCapabilities:
+        '''
+        Features with their ranges and increments. The snapshot is cached,
+        invalidated features are read again on the next call.
+        '''
+        if self._capabilities is None:
+            self._capabilities = CameraCapabilities.from_camera(self)
+        elif self._stale_capabilities:
+            self._capabilities = self._capabilities.refresh(self, self._stale_capabilities)
+        self._stale_capabilities = set()
+        return self._capabilities
+
+    def invalidate_capabilities(self, *features: str) -> None:
+        '''
+        Must be called by setters changing the constraints of other 
+        parameters: ROI setters invalidate the features whose range they
+        change, binning and pixel format changes invalidate everything 
+        (no argument). 
+        '''
+        if not features:
+            self._capabilities = None
+        self._stale_capabilities.update(features)
+
+    def invalidate_frame_dtype(self) -> None:
+        '''
+        Must be called whenever the image layout changes (ROI, width, height, 
+        pixel format) for backends caching their frame dtype.
+        '''
+        self._frame_dtype = None
+
+    def enable_frame_pool(self, num_frames: int = 8) -> None:
+        '''
+        Draw frames returned by get_frame from a ring of num_frames 
+        preallocated frames. Frames stay valid until they are passed to
+        release_frame, or recycled when the ring is exhausted.
+        '''
+        self.frame_pool = FramePool(num_frames)
+
+    def disable_frame_pool(self) -> None:
+        self.frame_pool = None
+
+    def release_frame(self, frame: NDArray) -> None:
+        if self.frame_pool is not None:
+            self.frame_pool.release(frame)
+
+    def _new_frame(self, dtype: DTypeLike) -> NDArray:
+        if self.frame_pool is not None:
+            return self.frame_pool.lease(dtype)
+        return np.empty((), dtype=dtype)
+
     @classmethod
     @abstractmethod
     def list_available_cameras(cls, *args, **kwargs) -> List[CameraInfo]:
@@ -22,7 +357,15 @@ class Camera(ABC):
 
     @abstractmethod
     def close(self) -> None:
-        pass
+        '''
+        Release the device. Backends call super().close() once done, which
+        shuts down the thread used by aget_frame.
+        '''
+        executor = getattr(self, '_executor', None)
+        if executor is not None:
+            # a read still blocked on the device must not block close
+            executor.shutdown(wait=False)
+            self._executor = None
 
     def __enter__(self):
         return self
@@ -42,6 +385,254 @@ class Camera(ABC):
     def get_frame(self) -> NDArray:
         pass
 
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        '''
+        Write the next frame into a preallocated structured array with the 
+        same layout as the frames returned by get_frame. Returns out, or None
+        if no frame is available. Backends should override this to write 
+        directly into out instead of allocating a new frame.
+        '''
+        frame = self.get_frame()
+        if frame is None:
+            return None
+        for name in frame.dtype.names:
+            out[name] = frame[name]
+        return out
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> Optional[FrameBatch]:
+        '''
+        Acquire num_frames frames into a FrameBatch. If out is provided, 
+        frames are written directly into it. Returns a view on the frames
+        actually acquired (fewer than num_frames if the source runs out), 
+        or None if no frame is available.
+        '''
+
+        if out is not None and len(out) < num_frames:
+            raise ValueError(f'FrameBatch too small for {num_frames} frames')
+
+        start = 0
+        if out is None:
+            # the first frame determines the batch layout
+            frame = self.get_frame()
+            if frame is None:
+                return None
+            out = FrameBatch.empty(num_frames, frame.dtype)
+            for name in frame.dtype.names:
+                getattr(out, name)[0] = frame[name]
+            self.release_frame(frame)
+            start = 1
+
+        for i in range(start, num_frames):
+            if self.get_frame_into(_FrameSlot(out, i)) is None:
+                return out[:i] if i > 0 else None
+
+        return out[:num_frames]
+
+    def frames(self, prefetch: Optional[int] = None) -> FrameIterator:
+        '''
+        Iterate over frames, prefetching up to prefetch frames in a 
+        background thread (PREFETCH by default, 0 to disable).
+        '''
+        if prefetch is None:
+            prefetch = self.PREFETCH
+        return FrameIterator(self, prefetch)
+
+    def __iter__(self) -> FrameIterator:
+        # no background thread: breaking out of a for loop leaves no 
+        # frame taken from the camera, use frames() to prefetch
+        return self.frames(prefetch=0)
+
+    async def aget_frame(self) -> Optional[NDArray]:
+        '''
+        Awaitable get_frame. The blocking call runs on a thread dedicated
+        to this camera so that the event loop is never stalled.
+        '''
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='camera')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.get_frame)
+
+    def aframes(self, queue_size: int = 2) -> AsyncFrameIterator:
+        '''
+        Asynchronous frame iterator: async for frame in cam.aframes()
+        '''
+        return AsyncFrameIterator(self, queue_size)
+
+    def _connect_frame_callback(self, callback: Callable[[], None]) -> bool:
+        '''
+        Backends with native new-frame events override this to call callback
+        whenever a frame can be retrieved without blocking. Returns False if
+        not supported.
+        '''
+        return False
+
+    def _disconnect_frame_callback(self) -> None:
+        pass
+
+    def apply_settings(self, settings: Dict[str, Any]) -> None:
+        '''
+        Apply a whole configuration in one transaction. Keys are validated 
+        before anything is sent to the camera, then applied in an order
+        where every intermediate state is valid: pixel format, binning, ROI
+        (offsetX, offsetY, width, height), exposure and framerate, gain. 
+        Backends stop acquisition only when required and reallocate their
+        buffers at most once.
+        '''
+        self._validate_settings(settings)
+        self._apply_settings(settings)
+        if settings.keys() & {'exposure', 'framerate'}:
+            # exposure and framerate limit each other
+            self.invalidate_capabilities('exposure', 'framerate')
+
+    def _validate_settings(self, settings: Dict[str, Any]) -> None:
+        for name in settings:
+            if name not in self.SETTINGS:
+                raise ValueError(f'{type(self).__name__} does not support setting {name}')
+            available = getattr(self, f'{name}_available', None)
+            if available is not None and not available():
+                raise ValueError(f'{name} is not available on {type(self).__name__}')
+        if 'binning' in settings:
+            binning = settings['binning']
+            if not (isinstance(binning, (tuple, list)) and len(binning) == 2):
+                raise ValueError('binning must be a (horizontal, vertical) pair')
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        if 'pixel_format' in settings:
+            self._set_pixel_format(settings['pixel_format'])
+        if 'binning' in settings:
+            self._set_binning(*settings['binning'])
+        if settings.keys() & {'offsetX', 'offsetY', 'width', 'height'}:
+            self._apply_ROI(**self._resolve_ROI(settings))
+        self._apply_exposure_framerate(settings.get('exposure'), settings.get('framerate'))
+        if 'gain' in settings:
+            self.set_gain(settings['gain'])
+
+    def _set_pixel_format(self, pixel_format: str) -> None:
+        # backends listing pixel_format in SETTINGS override this
+        raise ValueError(f'{type(self).__name__} does not support setting pixel_format')
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return None
+
+    def _set_binning(self, horizontal: int, vertical: int) -> None:
+        # backends listing binning in SETTINGS override this
+        raise ValueError(f'{type(self).__name__} does not support setting binning')
+
+    def _get_binning(self) -> Optional[Tuple[int, int]]:
+        return None
+
+    def get_setting(self, name: str) -> Any:
+        '''
+        Current value of one of SETTINGS, None if not available
+        '''
+        if name == 'pixel_format':
+            return self._get_pixel_format()
+        if name == 'binning':
+            return self._get_binning()
+        if not getattr(self, f'{name}_available')():
+            return None
+        return getattr(self, f'get_{name}')()
+
+    def export_state(self, filename: Optional[str] = None) -> Dict[str, Any]:
+        '''
+        Current value of every available setting, as accepted by 
+        apply_settings and load_state. Also saved as JSON if filename
+        is given.
+        '''
+        state = {}
+        for name in self.SETTINGS:
+            value = self.get_setting(name)
+            if value is None:
+                continue
+            if isinstance(value, (tuple, list)):
+                value = [v.item() if isinstance(v, np.generic) else v for v in value]
+            elif isinstance(value, np.generic):
+                value = value.item()
+            state[name] = value
+
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(state, f, indent=2)
+
+        return state
+
+    def load_state(self, state: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        '''
+        Restore settings from export_state, or from a JSON file saved by it.
+        Only the settings differing from the current state are applied, in 
+        a single apply_settings call. Returns the applied settings.
+        '''
+        if isinstance(state, str):
+            with open(state) as f:
+                state = json.load(f)
+
+        changes = {}
+        for name, value in state.items():
+            current = self.get_setting(name) if name in self.SETTINGS else None
+            if not self._same_setting(current, value):
+                changes[name] = value
+
+        if changes:
+            self.apply_settings(changes)
+        return changes
+
+    @staticmethod
+    def _same_setting(current: Any, value: Any) -> bool:
+        if current is None:
+            return False
+        if isinstance(current, (tuple, list)) and isinstance(value, (tuple, list)):
+            return list(current) == list(value)
+        if isinstance(current, (float, np.floating)) or isinstance(value, float):
+            return math.isclose(current, value, rel_tol=1e-6)
+        return current == value
+
+    def _resolve_ROI(self, settings: Dict[str, Any]) -> Dict[str, Optional[int]]:
+        # parameters that are not part of settings keep their current value
+        return {
+            name: settings[name] if name in settings else getattr(self, f'get_{name}')()
+            for name in ('offsetX', 'offsetY', 'width', 'height')
+        }
+
+    def _apply_ROI(
+            self, 
+            offsetX: Optional[int], 
+            offsetY: Optional[int], 
+            width: Optional[int], 
+            height: Optional[int]
+        ) -> None:
+        
+        resize = (
+            (self.width_available() and width != self.get_width()) or 
+            (self.height_available() and height != self.get_height())
+        )
+        
+        if resize:
+            # move to the origin first so that the new size fits on the sensor
+            if self.offsetX_available():
+                self.set_offsetX(0)
+            if self.offsetY_available():
+                self.set_offsetY(0)
+            if self.width_available():
+                self.set_width(width)
+            if self.height_available():
+                self.set_height(height)
+
+        if self.offsetX_available():
+            self.set_offsetX(offsetX)
+        if self.offsetY_available():
+            self.set_offsetY(offsetY)
+
+    def _apply_exposure_framerate(self, exposure: Optional[float], framerate: Optional[float]) -> None:
+        if exposure is not None and framerate is not None and exposure > (self.get_exposure() or 0):
+            # a longer exposure may only fit once the framerate is lowered 
+            self.set_framerate(framerate)
+            self.set_exposure(exposure)
+            return
+        if exposure is not None:
+            self.set_exposure(exposure)
+        if framerate is not None:
+            self.set_framerate(framerate)
+
     @abstractmethod
     def exposure_available(self) -> bool:
         pass
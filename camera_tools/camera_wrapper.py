@@ -0,0 +1,183 @@
+from camera_tools.camera import Camera, CameraInfo, FrameBatch, AcquisitionStats, CameraCapabilities
+from numpy.typing import NDArray
+from typing import Optional, Tuple, List, Dict, Any, Union
+
+class CameraWrapper(Camera):
+    '''
+    Forwards every call to a wrapped camera. Subclass and override the 
+    methods whose behavior should change.
+    '''
+
+    @classmethod
+    def list_available_cameras(cls) -> List[CameraInfo]:
+        return []
+
+    def __init__(self, camera: Camera, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.camera = camera
+
+    def close(self) -> None:
+        self.camera.close()
+        super().close()
+
+    def start_acquisition(self) -> None:
+        self.camera.start_acquisition()
+
+    def stop_acquisition(self) -> None:
+        self.camera.stop_acquisition()
+
+    def get_frame(self) -> Optional[NDArray]:
+        return self.camera.get_frame()
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        return self.camera.get_frame_into(out)
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> Optional[FrameBatch]:
+        return self.camera.get_frames(num_frames, out)
+
+    def enable_frame_pool(self, num_frames: int = 8) -> None:
+        self.camera.enable_frame_pool(num_frames)
+
+    def disable_frame_pool(self) -> None:
+        self.camera.disable_frame_pool()
+
+    def release_frame(self, frame: NDArray) -> None:
+        self.camera.release_frame(frame)
+
+    def reset_acquisition_stats(self) -> None:
+        self.camera.reset_acquisition_stats()
+
+    def get_acquisition_stats(self) -> AcquisitionStats:
+        return self.camera.get_acquisition_stats()
+
+    def get_capabilities(self) -> CameraCapabilities:
+        return self.camera.get_capabilities()
+
+    def invalidate_capabilities(self, *features: str) -> None:
+        self.camera.invalidate_capabilities(*features)
+
+    def apply_settings(self, settings: Dict[str, Any]) -> None:
+        self.camera.apply_settings(settings)
+
+    def export_state(self, filename: Optional[str] = None) -> Dict[str, Any]:
+        return self.camera.export_state(filename)
+
+    def load_state(self, state: Union[Dict[str, Any], str]) -> Dict[str, Any]:
+        return self.camera.load_state(state)
+
+    def exposure_available(self) -> bool:
+        return self.camera.exposure_available()
+
+    def set_exposure(self, exp_time: float) -> None:
+        self.camera.set_exposure(exp_time)
+
+    def get_exposure(self) -> Optional[float]:
+        return self.camera.get_exposure()
+
+    def get_exposure_range(self) -> Optional[Tuple[float,float]]:
+        return self.camera.get_exposure_range()
+
+    def get_exposure_increment(self) -> Optional[float]:
+        return self.camera.get_exposure_increment()
+
+    def framerate_available(self) -> bool:
+        return self.camera.framerate_available()
+
+    def set_framerate(self, fps: float) -> None:
+        self.camera.set_framerate(fps)
+
+    def get_framerate(self) -> Optional[float]:
+        return self.camera.get_framerate()
+
+    def get_framerate_range(self) -> Optional[Tuple[float,float]]:
+        return self.camera.get_framerate_range()
+
+    def get_framerate_increment(self) -> Optional[float]:
+        return self.camera.get_framerate_increment()
+
+    def gain_available(self) -> bool:
+        return self.camera.gain_available()
+
+    def set_gain(self, gain: float) -> None:
+        self.camera.set_gain(gain)
+
+    def get_gain(self) -> Optional[float]:
+        return self.camera.get_gain()
+
+    def get_gain_range(self) -> Optional[Tuple[float,float]]:
+        return self.camera.get_gain_range()
+
+    def get_gain_increment(self) -> Optional[float]:
+        return self.camera.get_gain_increment()
+
+    def ROI_available(self) -> bool:
+        return self.camera.ROI_available()
+
+    def set_ROI(self, left: int, bottom: int, height: int, width: int) -> None:
+        self.camera.set_ROI(left, bottom, height, width)
+
+    def get_ROI(self) -> Optional[Tuple[int,int,int,int]]:
+        return self.camera.get_ROI()
+
+    def offsetX_available(self) -> bool:
+        return self.camera.offsetX_available()
+
+    def set_offsetX(self, offsetX: int) -> None:
+        self.camera.set_offsetX(offsetX)
+
+    def get_offsetX(self) -> Optional[int]:
+        return self.camera.get_offsetX()
+
+    def get_offsetX_range(self) -> Optional[Tuple[int,int]]:
+        return self.camera.get_offsetX_range()
+
+    def get_offsetX_increment(self) -> Optional[int]:
+        return self.camera.get_offsetX_increment()
+
+    def offsetY_available(self) -> bool:
+        return self.camera.offsetY_available()
+
+    def set_offsetY(self, offsetY: int) -> None:
+        self.camera.set_offsetY(offsetY)
+
+    def get_offsetY(self) -> Optional[int]:
+        return self.camera.get_offsetY()
+
+    def get_offsetY_range(self) -> Optional[Tuple[int,int]]:
+        return self.camera.get_offsetY_range()
+
+    def get_offsetY_increment(self) -> Optional[int]:
+        return self.camera.get_offsetY_increment()
+
+    def width_available(self) -> bool:
+        return self.camera.width_available()
+
+    def set_width(self, width: int) -> None:
+        self.camera.set_width(width)
+
+    def get_width(self) -> Optional[int]:
+        return self.camera.get_width()
+
+    def get_width_range(self) -> Optional[Tuple[int,int]]:
+        return self.camera.get_width_range()
+
+    def get_width_increment(self) -> Optional[int]:
+        return self.camera.get_width_increment()
+
+    def height_available(self) -> bool:
+        return self.camera.height_available()
+
+    def set_height(self, height: int) -> None:
+        self.camera.set_height(height)
+
+    def get_height(self) -> Optional[int]:
+        return self.camera.get_height()
+
+    def get_height_range(self) -> Optional[Tuple[int,int]]:
+        return self.camera.get_height_range()
+
+    def get_height_increment(self) -> Optional[int]:
+        return self.camera.get_height_increment()
+
+    def get_num_channels(self) -> Optional[int]:
+        return self.camera.get_num_channels()
@@ -0,0 +1,95 @@
+import json
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+def default_cache_dir() -> Path:
+    '''
+    $CAMERA_TOOLS_CACHE_DIR, or the platform's user cache directory
+    '''
+    if 'CAMERA_TOOLS_CACHE_DIR' in os.environ:
+        return Path(os.environ['CAMERA_TOOLS_CACHE_DIR'])
+    if sys.platform.startswith('win'):
+        return Path(os.environ.get('LOCALAPPDATA', Path.home())) / 'camera_tools'
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'camera_tools'
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'camera_tools'
+
+def _read_sysfs(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+def video_device_identity(index: int) -> str:
+    '''
+    Stable identity of video device number index: USB vendor:product:serial
+    (or USB port when there is no serial number) on Linux, the index
+    elsewhere since OpenCV does not expose it
+    '''
+    device = Path(f'/sys/class/video4linux/video{index}/device')
+    if device.exists():
+        path = device.resolve()
+        # walk up from the interface to the USB device
+        for parent in (path, *path.parents):
+            vendor = _read_sysfs(parent / 'idVendor')
+            if vendor is not None:
+                product = _read_sysfs(parent / 'idProduct')
+                serial = _read_sysfs(parent / 'serial') or parent.name
+                return f'usb:{vendor}:{product}:{serial}'
+        return f'v4l2:{path.name}'
+    return f'index:{index}'
+
+class ConfigCache:
+    '''
+    JSON file mapping device identities to the configurations probed on
+    them, so that slow probing only happens once per device
+    '''
+
+    def __init__(self, filename: Optional[str] = None) -> None:
+        if filename is None:
+            filename = default_cache_dir() / 'webcam_configs.json'
+        self.filename = Path(filename)
+        self.lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.filename) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries: Dict[str, Any]) -> None:
+        try:
+            self.filename.parent.mkdir(parents=True, exist_ok=True)
+            # write then rename so that readers never see a partial file
+            tmp = self.filename.with_suffix('.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.filename)
+        except OSError as e:
+            logger.warning(f'Could not save config cache: {e}')
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self.lock:
+            return self._load().get(key)
+
+    def set(self, key: str, configs: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            entries = self._load()
+            entries[key] = configs
+            self._save(entries)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        '''
+        Forget one device, or every device if key is None
+        '''
+        with self.lock:
+            entries = {} if key is None else self._load()
+            entries.pop(key, None)
+            self._save(entries)
@@ -0,0 +1,134 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Tuple, List, Dict, Iterator, Iterable
+from camera_tools.camera import CameraInfo
+
+# backend name: (module, class), probed lazily so that missing SDKs only
+# disable their own backend
+BACKENDS: Dict[str, Tuple[str, str]] = {
+    'ZeroCam': ('camera_tools.zerocam', 'ZeroCam'),
+    'RandomCam': ('camera_tools.randomcam', 'RandomCam'),
+    'MovieFileCam': ('camera_tools.moviefilecam', 'MovieFileCam'),
+    'OpenCV_Webcam': ('camera_tools.webcam', 'OpenCV_Webcam'),
+    'V4L2_Webcam': ('camera_tools.webcam_v4l2', 'V4L2_Webcam'),
+    'AravisCamera': ('camera_tools.aravis', 'AravisCamera'),
+    'XimeaCamera': ('camera_tools.ximeacam', 'XimeaCamera'),
+    'SpinnakerCamera': ('camera_tools.spinnaker', 'SpinnakerCamera'),
+}
+
+DEFAULT_TTL: float = 10.0
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[float, List[CameraInfo]]] = {}
+_pending: Dict[str, Future] = {}
+_started: Dict[str, float] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+def _probe(backend: str) -> List[CameraInfo]:
+    with _lock:
+        _started[backend] = time.monotonic()
+    module, cls_name = BACKENDS[backend]
+    try:
+        camera_cls = getattr(importlib.import_module(module), cls_name)
+        return list(camera_cls.list_available_cameras() or [])
+    except Exception:
+        # backend not importable or no device driver
+        return []
+
+def _store(backend: str, future: Future) -> None:
+    with _lock:
+        _pending.pop(backend, None)
+        _started.pop(backend, None)
+        _cache[backend] = (time.monotonic(), future.result())
+
+def _submit(backend: str) -> Future:
+    # a probe still running from a previous call is reused, not restarted
+    global _executor
+    with _lock:
+        future = _pending.get(backend)
+        if future is not None:
+            return future
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(BACKENDS), thread_name_prefix='discovery')
+        future = _executor.submit(_probe, backend)
+        _pending[backend] = future
+    future.add_done_callback(lambda f: _store(backend, f))
+    return future
+
+def _cached(backend: str, ttl: float) -> Optional[List[CameraInfo]]:
+    with _lock:
+        entry = _cache.get(backend)
+    if entry is None or time.monotonic() - entry[0] > ttl:
+        return None
+    return list(entry[1])
+
+def iter_discover_cameras(
+        backends: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = 5.0,
+        ttl: float = DEFAULT_TTL,
+        refresh: bool = False
+    ) -> Iterator[Tuple[str, List[CameraInfo]]]:
+    '''
+    Probe backends concurrently and yield (backend, cameras) as each probe
+    completes, cached results first. Each probe is given timeout seconds 
+    from its own start: backends probing for longer are not yielded, their 
+    result is cached when they finish.
+    '''
+
+    if backends is None:
+        backends = BACKENDS.keys()
+
+    cached = []
+    futures = {}
+    for backend in backends:
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown backend {backend}')
+        cameras = None if refresh else _cached(backend, ttl)
+        if cameras is not None:
+            cached.append((backend, cameras))
+        else:
+            futures[_submit(backend)] = backend
+
+    yield from cached
+
+    while futures:
+        remaining = None
+        if timeout is not None:
+            # probes still queued in the executor have not used their time
+            now = time.monotonic()
+            with _lock:
+                deadlines = {
+                    future: _started.get(backend, now) + timeout 
+                    for future, backend in futures.items()
+                }
+            remaining = max(0, min(deadlines.values()) - now)
+
+        done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield futures.pop(future), future.result()
+
+        if not done:
+            # give up on the backends out of time only, keep waiting for 
+            # the others
+            now = time.monotonic()
+            for future, deadline in deadlines.items():
+                if deadline <= now and not future.done():
+                    del futures[future]
+
+def discover_cameras(
+        backends: Optional[Iterable[str]] = None,
+        timeout: Optional[float] = 5.0,
+        ttl: float = DEFAULT_TTL,
+        refresh: bool = False
+    ) -> Dict[str, List[CameraInfo]]:
+    '''
+    Cameras of every backend answering within timeout seconds, by backend.
+    Results are cached for ttl seconds, refresh=True probes again.
+    '''
+    return dict(iter_discover_cameras(backends, timeout, ttl, refresh))
+
+def clear_discovery_cache() -> None:
+    with _lock:
+        _cache.clear()
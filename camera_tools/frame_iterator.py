@@ -0,0 +1,143 @@
+import queue
+import threading
+import weakref
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional, TYPE_CHECKING
+from camera_tools.frame_pool import FramePool
+
+if TYPE_CHECKING:
+    from camera_tools.camera import Camera
+
+def acquire_into_pool(camera: 'Camera', pool: FramePool) -> Optional[NDArray]:
+    '''
+    Acquire the next frame of camera into a slot leased from pool.
+    Returns None if no frame is available.
+    '''
+
+    if pool.frames is None:
+        # the first frame determines the layout of the ring
+        frame = camera.get_frame()
+        if frame is None:
+            return None
+        slot = pool.lease(frame.dtype)
+        slot[...] = frame
+        camera.release_frame(frame)
+        return slot
+
+    slot = pool.lease()
+    if camera.get_frame_into(slot) is None:
+        pool.release(slot)
+        return None
+    return slot
+
+def _put(frames: queue.Queue, stop_event: threading.Event, item, poll_interval: float) -> bool:
+    while not stop_event.is_set():
+        try:
+            frames.put(item, timeout=poll_interval)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _prefetch(
+        camera: 'Camera', 
+        pool: FramePool, 
+        frames: queue.Queue, 
+        stop_event: threading.Event, 
+        poll_interval: float
+    ) -> None:
+    # holds no reference to the iterator, which stops the thread when it 
+    # is garbage collected
+    try:
+        while not stop_event.is_set():
+            frame = acquire_into_pool(camera, pool)
+            if not _put(frames, stop_event, frame, poll_interval) or frame is None:
+                return
+    except Exception as e:
+        _put(frames, stop_event, e, poll_interval)
+
+class FrameIterator:
+    '''
+    Iterator over the frames of a camera. With prefetch > 0, a background
+    thread keeps up to prefetch frames ready in a ring of preallocated
+    frames, so that waiting on the driver overlaps with the consumer's work.
+    A frame stays valid until the next iteration. Call close (or use as a
+    context manager) to stop the background thread, it is otherwise only
+    stopped once the iterator is garbage collected.
+    '''
+
+    POLL_INTERVAL: float = 0.1
+
+    def __init__(self, camera: 'Camera', prefetch: int = 2) -> None:
+
+        if prefetch < 0:
+            raise ValueError('prefetch must be positive')
+
+        self.camera = camera
+        self.prefetch = prefetch
+        self.pool = FramePool(prefetch + 2)
+        self.queue = queue.Queue(maxsize=max(prefetch, 1))
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.current = None
+        self.closed = False
+        # stop prefetching when the iterator is dropped without close, 
+        # e.g. after breaking out of a for loop
+        self._finalizer = weakref.finalize(self, self.stop_event.set)
+
+    def __iter__(self) -> 'FrameIterator':
+        return self
+
+    def __enter__(self) -> 'FrameIterator':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __next__(self) -> NDArray:
+
+        if self.closed:
+            raise StopIteration
+
+        if self.current is not None:
+            self.pool.release(self.current)
+            self.current = None
+
+        if self.prefetch == 0:
+            frame = acquire_into_pool(self.camera, self.pool)
+        else:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target = _prefetch,
+                    args = (self.camera, self.pool, self.queue, self.stop_event, self.POLL_INTERVAL),
+                    daemon = True
+                )
+                self.thread.start()
+            frame = self.queue.get()
+
+        if isinstance(frame, BaseException):
+            self.close()
+            raise frame
+        if frame is None:
+            self.close()
+            raise StopIteration
+
+        self.current = frame
+        return frame
+
+    def close(self) -> None:
+        '''
+        Stop prefetching and drop frames that were not consumed
+        '''
+        self.closed = True
+        self._finalizer()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        while not self.queue.empty():
+            frame = self.queue.get_nowait()
+            if isinstance(frame, np.ndarray):
+                self.pool.release(frame)
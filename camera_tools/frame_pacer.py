@@ -0,0 +1,76 @@
+import sys
+import time
+
+class FramePacer:
+    '''
+    Paces a frame loop against an absolute schedule: frame n is due at
+    start + n*period, so time spent between calls and sleep overshoot do
+    not accumulate. wait sleeps until spin_ns before the deadline, then
+    spins for the remainder, which is precise without keeping a core busy.
+
+    A frame is late when wait is called after its deadline. Slots missed
+    by more than a period are skipped rather than delivered in a burst.
+    fps = 0 disables pacing.
+    '''
+
+    # sleep overshoot to absorb by spinning: timers are coarser on Windows
+    SPIN_NS: int = 1_500_000 if sys.platform.startswith('win') else 300_000
+
+    def __init__(self, fps: float = 0, spin_ns: int = SPIN_NS) -> None:
+
+        if spin_ns < 0:
+            raise ValueError('spin_ns must be positive')
+
+        self.spin_ns = spin_ns
+        self.set_framerate(fps)
+
+    def set_framerate(self, fps: float) -> None:
+        if fps < 0:
+            raise ValueError('fps must be positive')
+        self.fps = fps
+        self.period_ns = round(1e9 / fps) if fps > 0 else 0
+        self.reset()
+
+    def reset(self) -> None:
+        '''
+        Restart the schedule, the next frame is due immediately
+        '''
+        self.deadline_ns = None
+        self.num_frames = 0
+        self.num_late = 0
+        self.num_skipped = 0
+        self.drift_ns = 0
+        self.max_drift_ns = 0
+
+    def wait(self) -> int:
+        '''
+        Block until the next frame is due. Returns its deadline in
+        time.perf_counter_ns time, the current time if pacing is disabled.
+        '''
+        now = time.perf_counter_ns()
+        if self.period_ns == 0:
+            return now
+
+        if self.deadline_ns is None:
+            self.deadline_ns = now
+        deadline = self.deadline_ns
+
+        remaining = deadline - now
+        if remaining > self.spin_ns:
+            time.sleep((remaining - self.spin_ns) * 1e-9)
+        while now < deadline:
+            now = time.perf_counter_ns()
+
+        # delay between deadline and release, the spin keeps it within a
+        # few us unless the frame is late
+        self.drift_ns = now - deadline
+        self.max_drift_ns = max(self.max_drift_ns, self.drift_ns)
+        self.num_frames += 1
+        if remaining < 0:
+            self.num_late += 1
+
+        # next slot on the schedule, skipping those already missed
+        missed = self.drift_ns // self.period_ns
+        self.num_skipped += missed
+        self.deadline_ns = deadline + (missed + 1) * self.period_ns
+        return deadline
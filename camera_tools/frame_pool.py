@@ -0,0 +1,97 @@
+import threading
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from typing import Optional
+
+class FramePool:
+    '''
+    Ring of preallocated structured frames. Frames are leased in ring order
+    and stay valid until they are released, or until they are recycled
+    because every slot of the ring is leased.
+    '''
+
+    def __init__(self, num_frames: int = 8, dtype: Optional[DTypeLike] = None) -> None:
+
+        if num_frames < 1:
+            raise ValueError('num_frames must be at least 1')
+
+        self.num_frames = num_frames
+        # reentrant: lease reallocates while holding it
+        self.lock = threading.RLock()
+        self.leased = np.zeros(num_frames, dtype=bool)
+        # lease count at the time each slot was leased, to find the oldest
+        self.lease_order = np.zeros(num_frames, dtype=np.int64)
+        self.num_leases = 0
+        self.next_slot = 0
+        self.num_recycled = 0
+        self.dtype = None
+        self.frames = None
+
+        if dtype is not None:
+            self.allocate(dtype)
+
+    def allocate(self, dtype: DTypeLike) -> None:
+        '''
+        (Re)allocate the ring for a new frame layout. Frames leased from
+        the previous ring are not tracked anymore.
+        '''
+        with self.lock:
+            self.dtype = np.dtype(dtype)
+            self.frames = np.zeros((self.num_frames,), dtype=self.dtype)
+            self.leased[:] = False
+            self.lease_order[:] = 0
+            self.next_slot = 0
+
+    def lease(self, dtype: Optional[DTypeLike] = None) -> NDArray:
+        '''
+        Return a 0-d view on a free slot of the ring. If every slot is
+        leased, the oldest one is recycled.
+        '''
+
+        with self.lock:
+            # dtypes differing only by metadata (output format) compare equal
+            if dtype is not None and (dtype != self.dtype or np.dtype(dtype).metadata != self.dtype.metadata):
+                self.allocate(dtype)
+            elif self.frames is None:
+                raise RuntimeError('FramePool has no frame layout, call allocate first')
+
+            for i in range(self.num_frames):
+                slot = (self.next_slot + i) % self.num_frames
+                if not self.leased[slot]:
+                    break
+            else:
+                # releases can come out of order: the next slot is not 
+                # necessarily the oldest lease
+                slot = int(np.argmin(self.lease_order))
+                self.num_recycled += 1
+
+            self.leased[slot] = True
+            self.num_leases += 1
+            self.lease_order[slot] = self.num_leases
+            self.next_slot = (slot + 1) % self.num_frames
+            return self.frames[slot, ...]
+
+    def _slot(self, frame: NDArray) -> Optional[int]:
+
+        if self.frames is None or frame.dtype != self.dtype:
+            return None
+
+        offset = frame.__array_interface__['data'][0] - self.frames.__array_interface__['data'][0]
+        slot, remainder = divmod(offset, self.dtype.itemsize)
+        if remainder != 0 or not (0 <= slot < self.num_frames):
+            return None
+
+        return slot
+
+    def release(self, frame: NDArray) -> None:
+        '''
+        Give a leased frame back to the pool. Frames that do not belong
+        to the current ring are ignored.
+        '''
+        with self.lock:
+            slot = self._slot(frame)
+            if slot is not None:
+                self.leased[slot] = False
+
+    def num_leased(self) -> int:
+        return int(np.count_nonzero(self.leased))
@@ -0,0 +1,132 @@
+import time
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional, Dict, Callable
+
+PERCENTILES = (50, 99, 99.9)
+
+class LatencyHistogram:
+    '''
+    Fixed-memory histogram of integer durations in ns with HDR-style
+    buckets: values below 2**significant_bits are recorded exactly, larger
+    values with a relative precision of 2**-(significant_bits-1).
+    Values above 2**max_bits ns are clamped to the last bucket.
+    '''
+
+    def __init__(self, significant_bits: int = 7, max_bits: int = 40) -> None:
+
+        if not (1 <= significant_bits < max_bits):
+            raise ValueError('significant_bits must be between 1 and max_bits')
+
+        self.significant_bits = significant_bits
+        self.max_bits = max_bits
+        self.sub_bucket_count = 2**significant_bits
+        self.half_count = self.sub_bucket_count // 2
+        self.max_value = 2**max_bits - 1
+        num_buckets = (max_bits - significant_bits + 1) * self.half_count + self.half_count
+        self.counts = np.zeros(num_buckets, dtype=np.int64)
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts[:] = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _bucket(self, value: int) -> int:
+        exponent = value.bit_length() - self.significant_bits
+        if exponent <= 0:
+            return value
+        return exponent * self.half_count + (value >> exponent)
+
+    def _bucket_bound(self, bucket: int) -> int:
+        # highest value falling in the bucket
+        exponent = np.maximum(bucket // self.half_count - 1, 0)
+        start = (bucket - exponent * self.half_count) << exponent
+        return start + (1 << exponent) - 1
+
+    def record(self, value: int) -> None:
+        value = min(max(int(value), 0), self.max_value)
+        self.counts[self._bucket(value)] += 1
+        self.total += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> Optional[int]:
+        '''
+        Value in ns below which q percent of the recorded values fall,
+        within the precision of the histogram
+        '''
+        if self.total == 0:
+            return None
+        rank = max(1, int(np.ceil(q / 100 * self.total)))
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return int(min(self._bucket_bound(bucket), self.max))
+
+    def report(self) -> Dict[str, Optional[int]]:
+        res = {'count': self.total, 'min': self.min}
+        for q in PERCENTILES:
+            res[f'p{q:g}'] = self.percentile(q)
+        res['max'] = self.max
+        return res
+
+class LatencyRecorder:
+    '''
+    Records for every frame, in separate histograms:
+        transport: driver return (host_timestamp_ns) minus device timestamp,
+            relative to the smallest value seen (device and host clocks
+            are not synchronized)
+        wrapper: get_frame return minus driver return
+        consumer: time spent by the caller between get_frame calls
+    '''
+
+    STAGES = ('transport', 'wrapper', 'consumer')
+
+    def __init__(self, significant_bits: int = 7) -> None:
+        self.histograms = {stage: LatencyHistogram(significant_bits) for stage in self.STAGES}
+        self.depth = 0
+        self.reset()
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.min_lag_ns = None
+        self.last_return_ns = None
+
+    def record(self, call_ns: int, frame: NDArray) -> None:
+        return_ns = time.perf_counter_ns()
+        host_timestamp_ns = int(frame['host_timestamp_ns'])
+        lag = host_timestamp_ns - int(frame['timestamp_ns'])
+
+        if self.min_lag_ns is None or lag < self.min_lag_ns:
+            self.min_lag_ns = lag
+        self.histograms['transport'].record(lag - self.min_lag_ns)
+        self.histograms['wrapper'].record(return_ns - host_timestamp_ns)
+        if self.last_return_ns is not None:
+            self.histograms['consumer'].record(call_ns - self.last_return_ns)
+        self.last_return_ns = return_ns
+
+    def instrument(self, method: Callable) -> Callable:
+        '''
+        Wrap a get_frame-like bound method
+        '''
+        def instrumented(*args, **kwargs):
+            if self.depth > 0:
+                # get_frame implemented on top of get_frame_into
+                return method(*args, **kwargs)
+            call_ns = time.perf_counter_ns()
+            self.depth += 1
+            try:
+                frame = method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+            if frame is not None:
+                self.record(call_ns, frame)
+            return frame
+        instrumented.__wrapped__ = method
+        return instrumented
+
+    def report(self) -> Dict[str, Dict[str, Optional[int]]]:
+        return {stage: histogram.report() for stage, histogram in self.histograms.items()}
@@ -0,0 +1,180 @@
+from camera_tools.camera import Camera, FrameBatch
+from camera_tools.camera_wrapper import CameraWrapper
+import logging
+import threading
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+class LatestFrameGrabber:
+    '''
+    Acquires frames continuously in a dedicated thread and keeps only
+    the most recent one. Frames go through three preallocated buffers:
+    the grabber writes into the back buffer and swaps it with the middle
+    one when complete, readers swap the middle one with the front buffer.
+    The frame returned by latest stays untouched until the next call.
+    '''
+
+    def __init__(
+            self,
+            get_frame: Callable[[], Optional[NDArray]],
+            get_frame_into: Callable[[NDArray], Optional[NDArray]]
+        ) -> None:
+
+        self._get_frame = get_frame
+        self._get_frame_into = get_frame_into
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.back = None
+        self.middle = None
+        self.front = None
+        self.fresh = False
+        self.finished = False
+        self.exception = None
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        # one event per thread: a thread still blocked in a read after
+        # stop must not be revived by the next start
+        self.stop_event = threading.Event()
+        self.fresh = False
+        self.finished = False
+        self.exception = None
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,), daemon=True)
+        self.thread.start()
+
+    def request_stop(self) -> None:
+        '''
+        Ask the thread to stop once the read in progress returns
+        '''
+        self.stop_event.set()
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        '''
+        Stop the thread and wait for it. Returns False if it is still
+        blocked in a read after timeout seconds, it then exits on its own
+        once the read returns.
+        '''
+        if self.thread is None:
+            return True
+        self.stop_event.set()
+        self.thread.join(timeout)
+        stopped = not self.thread.is_alive()
+        self.thread = None
+        return stopped
+
+    def _publish(self) -> None:
+        with self.condition:
+            self.back, self.middle = self.middle, self.back
+            self.fresh = True
+            self.condition.notify_all()
+
+    def _run(self, stop_event: threading.Event) -> None:
+        try:
+            # the first frame determines the buffer layout
+            frame = self._get_frame()
+            if frame is None or stop_event.is_set():
+                return
+            self.back = np.empty_like(frame)
+            self.middle = np.empty_like(frame)
+            self.front = np.empty_like(frame)
+            self.back[...] = frame
+            self._publish()
+
+            while not stop_event.is_set():
+                if self._get_frame_into(self.back) is None or stop_event.is_set():
+                    return
+                self._publish()
+
+        except Exception as e:
+            # reads interrupted by stopping the camera are expected
+            if not stop_event.is_set():
+                self.exception = e
+
+        finally:
+            with self.condition:
+                if stop_event is self.stop_event:
+                    self.finished = True
+                    self.condition.notify_all()
+
+    def latest(self, timeout: Optional[float] = None) -> Optional[NDArray]:
+        '''
+        Return the most recent frame, waiting for a frame newer than the
+        last one returned if needed. Returns None on timeout or once the
+        source is exhausted.
+        '''
+        with self.condition:
+            self.condition.wait_for(lambda: self.fresh or self.finished, timeout)
+            if self.exception is not None:
+                raise self.exception
+            if not self.fresh:
+                return None
+            self.middle, self.front = self.front, self.middle
+            self.fresh = False
+            return self.front
+
+class LatestFrameCamera(CameraWrapper):
+    '''
+    Wraps any camera and grabs its frames in a background thread.
+    get_frame always returns the newest frame instead of the next one
+    queued by the driver, minimizing latency for closed-loop experiments.
+    '''
+
+    SAFE_MODE: bool = False
+    # seconds to wait for the grab thread once the camera is stopped
+    STOP_TIMEOUT: float = 2.0
+
+    def __init__(self, camera: Camera, timeout: Optional[float] = None, *args, **kwargs) -> None:
+        super().__init__(camera, *args, **kwargs)
+        self.timeout = timeout
+        self.grabber = LatestFrameGrabber(camera.get_frame, camera.get_frame_into)
+
+    def start_acquisition(self) -> None:
+        self.camera.start_acquisition()
+        self.grabber.start()
+
+    def stop_acquisition(self) -> None:
+        # blocking backends (Aravis, Spinnaker) only return from a read 
+        # once acquisition stops: stop the camera before joining
+        self.grabber.request_stop()
+        self.camera.stop_acquisition()
+        if not self.grabber.stop(self.STOP_TIMEOUT):
+            logger.warning('grab thread still blocked in a read after stop_acquisition')
+
+    def get_frame(self) -> Optional[NDArray]:
+        frame = self.grabber.latest(self.timeout)
+        if frame is None:
+            return None
+
+        if self.frame_pool is not None:
+            output = self._new_frame(frame.dtype)
+            output[...] = frame
+            return output
+
+        if self.SAFE_MODE:
+            return frame.copy()
+
+        return frame
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        frame = self.grabber.latest(self.timeout)
+        if frame is None:
+            return None
+        for name in frame.dtype.names:
+            out[name] = frame[name]
+        return out
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> Optional[FrameBatch]:
+        return Camera.get_frames(self, num_frames, out)
+
+    enable_frame_pool = Camera.enable_frame_pool
+    disable_frame_pool = Camera.disable_frame_pool
+    release_frame = Camera.release_frame
+
+    def close(self) -> None:
+        self.stop_acquisition()
+        super().close()
@@ -0,0 +1,165 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+import cv2
+import numpy as np
+from numpy.typing import NDArray
+from typing import Optional, Tuple, Callable, Union
+from camera_tools.camera import frame_dtype
+from camera_tools.frame_pool import FramePool
+
+# (index, timestamp_ns, host_timestamp_ns, JPEG bytes)
+Payload = Tuple[int, int, int, Union[bytes, NDArray]]
+
+class MJPEGDecoder:
+    '''
+    Decodes a stream of JPEG payloads on a thread pool. A reader thread
+    pulls compressed frames from grab and submits them for decoding into
+    a ring of preallocated frames; futures are queued in capture order,
+    which makes the queue a reorder buffer: frames come out in order even
+    when a later one finishes decoding first. OpenCV releases the GIL while
+    decoding, so throughput scales with the number of workers.
+
+    grab returns None at the end of the stream. Payloads that fail to
+    decode are skipped and counted in num_corrupt.
+    '''
+
+    POLL_INTERVAL: float = 0.1
+
+    def __init__(
+            self,
+            grab: Callable[[], Optional[Payload]],
+            height: int,
+            width: int,
+            output_format: str = 'rgb',
+            num_workers: int = 4,
+            max_pending: Optional[int] = None
+        ) -> None:
+
+        if output_format not in ('rgb', 'bgr', 'gray'):
+            raise ValueError(f'Unsupported output format {output_format}')
+        if num_workers < 1:
+            raise ValueError('num_workers must be at least 1')
+
+        self.grab = grab
+        self.output_format = output_format
+        self.num_workers = num_workers
+        # enough frames in flight to keep every worker busy
+        self.max_pending = 2*num_workers if max_pending is None else max_pending
+
+        shape = (height, width) if output_format == 'gray' else (height, width, 3)
+        self.dtype = frame_dtype(np.uint8, shape, output_format)
+        # one extra slot for the frame held by the caller
+        self.pool = FramePool(self.max_pending + 1, self.dtype)
+
+        self.pending = threading.Semaphore(self.max_pending)
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.executor = None
+        self.thread = None
+        self.current = None
+        self.num_corrupt = 0
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='mjpeg')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        # at most max_pending decodes left to finish
+        self.executor.shutdown(wait=True)
+        self.executor = None
+
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if isinstance(item, Future):
+                if item.exception() is None:
+                    self.pool.release(item.result()[0])
+                self.pending.release()
+        if self.current is not None:
+            self.pool.release(self.current)
+            self.current = None
+
+    def _decode(self, payload: Payload, slot: NDArray) -> Tuple[NDArray, bool]:
+        index, timestamp_ns, host_timestamp_ns, jpeg = payload
+
+        buffer = np.frombuffer(jpeg, dtype=np.uint8)
+        if self.output_format == 'gray':
+            # luma only, chroma is not decoded
+            image = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+        else:
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+        if image is None or image.shape != slot['image'].shape:
+            return slot, False
+
+        slot['index'] = index
+        slot['timestamp_ns'] = timestamp_ns
+        slot['host_timestamp_ns'] = host_timestamp_ns
+        if self.output_format == 'rgb':
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=slot['image'])
+        else:
+            slot['image'] = image
+        return slot, True
+
+    def _acquire_pending(self) -> bool:
+        while not self.stop_event.is_set():
+            if self.pending.acquire(timeout=self.POLL_INTERVAL):
+                return True
+        return False
+
+    def _run(self) -> None:
+        try:
+            while self._acquire_pending():
+                payload = self.grab()
+                if payload is None:
+                    self.queue.put(None)
+                    return
+                slot = self.pool.lease()
+                self.queue.put(self.executor.submit(self._decode, payload, slot))
+        except Exception as e:
+            self.queue.put(e)
+
+    def get_frame(self) -> Optional[NDArray]:
+        '''
+        Next decoded frame in capture order, valid until the next call.
+        None at the end of the stream.
+        '''
+        if self.current is not None:
+            self.pool.release(self.current)
+            self.current = None
+
+        while True:
+            item = self.queue.get()
+            if item is None or isinstance(item, BaseException):
+                # keep the end of the stream visible to later calls
+                self.queue.put(item)
+                if item is None:
+                    return None
+                raise item
+
+            frame, valid = item.result()
+            self.pending.release()
+            if valid:
+                self.current = frame
+                return frame
+
+            self.num_corrupt += 1
+            self.pool.release(frame)
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        frame = self.get_frame()
+        if frame is None:
+            return None
+        # field by field: out can be a row of a FrameBatch
+        for name in frame.dtype.names:
+            out[name] = frame[name]
+        return out
@@ -1,4 +1,5 @@
-from camera_tools.camera import Camera, CameraInfo
+from camera_tools.camera import Camera, CameraInfo, FrameBatch, frame_dtype, OUTPUT_FORMATS
+from camera_tools.frame_pacer import FramePacer
 from video_tools import InMemory_OpenCV_VideoReader, get_video_info
 import time
 import numpy as np
@@ -29,6 +30,7 @@ class MovieFileCam(Camera):
 
     DEFAULT_FPS: float = 60
     SAFE_MODE: bool = False
+    OUTPUT_FORMAT: str = 'native'
 
     @classmethod
     def list_available_cameras(cls) -> List[CameraInfo]:
@@ -44,10 +46,26 @@ class MovieFileCam(Camera):
             cam_info.append(cam)
         return cam_info
 
-    def __init__(self, filename: str, loop: bool = False, *args, **kwargs):
-
+    def __init__(
+            self, 
+            filename: str, 
+            loop: bool = False, 
+            output_format: Optional[str] = None, 
+            *args, 
+            **kwargs
+        ):
+        '''
+        output_format is one of OUTPUT_FORMATS (OUTPUT_FORMAT by default), 
+        native is BGR as decoded by OpenCV
+        '''
         super().__init__(*args, **kwargs)
 
+        if output_format is None:
+            output_format = self.OUTPUT_FORMAT
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'Unsupported output format {output_format}')
+        self.output_format = output_format
+
         self.img_count: int = 0
         if not os.path.isfile(filename):
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), filename)
@@ -59,9 +77,8 @@ class MovieFileCam(Camera):
         self.num_channels = info["num_channels"]
 
         self.reader = None
-        self.fps = self.DEFAULT_FPS
+        self.pacer = FramePacer(self.DEFAULT_FPS)
         self.video_fps = None
-        self.prev_time = 0
         self.loop = loop
 
     def start_acquisition(self) -> None:
@@ -71,56 +88,133 @@ class MovieFileCam(Camera):
         self.width = int(self.reader.get(cv2.CAP_PROP_FRAME_WIDTH))
          
         # preallocate memory
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.height, self.width, self.num_channels))
-            ])
-        )
+        self.frame = np.empty((), dtype=self._get_frame_dtype())
+        self.decoded = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.pacer.reset()
+
+    def get_output_format(self) -> str:
+        '''
+        Layout of the images: rgb, bgr or gray
+        '''
+        return 'bgr' if self.output_format == 'native' else self.output_format
+
+    def _get_frame_dtype(self) -> np.dtype:
+        shape = (self.height, self.width)
+        if self.get_num_channels() > 1:
+            shape += (self.get_num_channels(),)
+        return frame_dtype(np.uint8, shape, self.get_output_format())
 
     def stop_acquisition(self) -> None:
         if self.reader is not None:
             self.reader.release()
         self.reader = None
 
-    def get_frame(self) -> Optional[NDArray]:
+    def _read(self, image: NDArray) -> Optional[NDArray]:
+        '''
+        Decode the next frame into image if OpenCV can write its BGR output 
+        there directly, into a persistent buffer otherwise. Either way no
+        memory is allocated. Returns the decoded image, None at the end of 
+        the video.
+        '''
+        target = image if image.shape == self.decoded.shape else self.decoded
+        rval, img = self.reader.read(image=target)
+        if not rval: 
+            if not self.loop:
+                return None
+            # rewind, keeping buffers and playback schedule
+            self.reader.release()
+            self.reader = cv2.VideoCapture(self.filename)
+            target = image if image.shape == self.decoded.shape else self.decoded
+            rval, img = self.reader.read(image=target)
+        return img if rval else None
+
+    def _decode_into(self, image: NDArray) -> bool:
+        '''
+        Decode the next frame into image in the output format. Returns 
+        False at the end of the video.
+        '''
+        output_format = self.get_output_format()
+        # BGR is decoded in place, other layouts are converted from it
+        img = self._read(image if output_format == 'bgr' else self.decoded)
+        if img is None:
+            return False
+        
+        if output_format == 'bgr':
+            if img is not image:
+                # decoded in the intermediate buffer 
+                image[...] = img
+        else:
+            code = cv2.COLOR_BGR2GRAY if output_format == 'gray' else cv2.COLOR_BGR2RGB
+            if cv2.cvtColor(img, code, dst=image) is not image:
+                # OpenCV allocates when image does not match the output layout
+                image[...] = cv2.cvtColor(img, code)
+        return True
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
 
         if self.reader is None:
             return
         
+        if not self._decode_into(out['image']):
+            return
+
         self.img_count += 1
-        rval, img = self.reader.read()
-        if not rval: 
-            if self.loop:
-                self.stop_acquisition()
-                self.start_acquisition()
-                rval, img = self.reader.read()
-            else:
-                return
-        
-        timestamp = self.img_count/self.video_fps
+        # prepared ahead of its deadline, released on schedule
+        deadline_ns = self.pacer.wait()
+        host_timestamp_ns = time.perf_counter_ns()
+        timestamp_ns = round(self.img_count * 1e9 / self.video_fps)
 
-        self.frame['index'] = self.img_count
-        self.frame['timestamp'] = timestamp
-        self.frame['image'] = img
+        out['index'] = self.img_count
+        out['timestamp_ns'] = timestamp_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
+        return out
 
-        if self.SAFE_MODE:
-            output = self.frame.copy()
-        else:
-            output = self.frame
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> Optional[FrameBatch]:
 
-        current_time = time.perf_counter() 
-        
-        if self.fps == 0:
-            self.prev_time = current_time
-            return output
+        if self.reader is None:
+            return
+
+        if out is None:
+            out = FrameBatch.empty(num_frames, self.frame.dtype)
+        elif len(out) < num_frames:
+            raise ValueError(f'FrameBatch too small for {num_frames} frames')
+
+        # frames are decoded straight into the batch
+        for i in range(num_frames):
+            if not self._decode_into(out.image[i]):
+                return out[:i] if i > 0 else None
 
-        while current_time - self.prev_time < 1/self.fps:
-            current_time = time.perf_counter()
+            self.img_count += 1
+            deadline_ns = self.pacer.wait()
+            host_timestamp_ns = time.perf_counter_ns()
+            out.index[i] = self.img_count
+            out.timestamp_ns[i] = round(self.img_count * 1e9 / self.video_fps)
+            out.host_timestamp_ns[i] = host_timestamp_ns
+            self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
 
-        self.prev_time = current_time
-        return output
+        return out[:num_frames]
+
+    def get_frame(self) -> Optional[NDArray]:
+
+        if self.reader is None:
+            return
+        
+        if self.frame_pool is not None:
+            frame = self._new_frame(self.frame.dtype)
+            if self.get_frame_into(frame) is None:
+                self.release_frame(frame)
+                return
+            return frame
+
+        frame = self.get_frame_into(self.frame)
+        if frame is None:
+            return
+        
+        if self.SAFE_MODE:
+            return frame.copy()
+        
+        return frame
     
     def exposure_available(self) -> bool:
         return False
@@ -141,10 +235,10 @@ class MovieFileCam(Camera):
         return True
     
     def set_framerate(self, fps: float) -> None:
-        self.fps = fps
+        self.pacer.set_framerate(fps)
     
     def get_framerate(self) -> Optional[float]:
-        return self.fps
+        return self.pacer.fps
 
     def get_framerate_range(self) -> Optional[Tuple[float,float]]:
         return (0,1000)
@@ -239,10 +333,10 @@ class MovieFileCam(Camera):
         return 0 
     
     def get_num_channels(self) -> Optional[int]:
-        return self.num_channels
+        return 1 if self.get_output_format() == 'gray' else 3
 
     def close(self) -> None:
-        ...
+        super().close()
 
 
 class BufferedMovieFileCam(Camera):
@@ -282,7 +376,7 @@ class BufferedMovieFileCam(Camera):
         if not os.path.isfile(filename):
             raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), filename)
         
-        info = get_video_info(filename, safe)
+        info = get_video_info(filename, self.SAFE_MODE)
         self.height = info["height"]
         self.width = info["width"]
         self.num_channels = info["num_channels"]
@@ -310,17 +404,47 @@ class BufferedMovieFileCam(Camera):
         if self.reader is not None:
             rval, img = self.reader.next_frame()
             if rval:
-                self.img_count += 1
-
-                frame = np.array(
-                    (self.img_count, time.perf_counter(), img),
-                    dtype = np.dtype([
-                        ('index', int),
-                        ('timestamp', np.float32),
-                        ('image', img.dtype, img.shape)
-                    ])
-                )
-                return frame
+                frame = self._new_frame(frame_dtype(img.dtype, img.shape))
+                return self._fill_frame(frame, img)
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        if self.reader is not None:
+            rval, img = self.reader.next_frame()
+            if rval:
+                return self._fill_frame(out, img)
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> Optional[FrameBatch]:
+
+        if out is not None and len(out) < num_frames:
+            raise ValueError(f'FrameBatch too small for {num_frames} frames')
+
+        for i in range(num_frames):
+            rval, img = self.reader.next_frame()
+            if not rval:
+                return out[:i] if i > 0 else None
+            if out is None:
+                # the first frame determines the batch layout
+                out = FrameBatch.empty(num_frames, frame_dtype(img.dtype, img.shape))
+
+            self.img_count += 1
+            host_timestamp_ns = time.perf_counter_ns()
+            out.index[i] = self.img_count
+            out.timestamp_ns[i] = host_timestamp_ns
+            out.host_timestamp_ns[i] = host_timestamp_ns
+            out.image[i] = img
+            self._update_stats(self.img_count)
+
+        return out[:num_frames]
+
+    def _fill_frame(self, out: NDArray, img: NDArray) -> NDArray:
+        self.img_count += 1
+        host_timestamp_ns = time.perf_counter_ns()
+        out['index'] = self.img_count
+        out['timestamp_ns'] = host_timestamp_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        out['image'] = img
+        self._update_stats(self.img_count)
+        return out
 
     def exposure_available(self) -> bool:
         return False
@@ -449,62 +573,8 @@ class BufferedMovieFileCam(Camera):
         pass
 
     def close(self) -> None:
-        ...
+        super().close()
         
 class MovieFileCamGray(MovieFileCam):
 
-    def start_acquisition(self) -> None:
-        self.reader = cv2.VideoCapture(self.filename)
-        self.video_fps = self.reader.get(cv2.CAP_PROP_FPS)
-        self.height = int(self.reader.get(cv2.CAP_PROP_FRAME_HEIGHT)) 
-        self.width = int(self.reader.get(cv2.CAP_PROP_FRAME_WIDTH))
-         
-        # preallocate memory
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.height, self.width))
-            ])
-        )
-
-    def get_frame(self) -> Optional[NDArray]:
-
-        if self.reader is None:
-            return
-        
-        self.img_count += 1
-        rval, img = self.reader.read()
-        if not rval: 
-            if self.loop:
-                self.stop_acquisition()
-                self.start_acquisition()
-                rval, img = self.reader.read()
-            else:
-                return
-            
-        timestamp = self.img_count/self.video_fps
-
-        self.frame['index'] = self.img_count
-        self.frame['timestamp'] = timestamp
-        self.frame['image'] = img[...,0]
-
-        if self.SAFE_MODE:
-            output = self.frame.copy()
-        else:
-            output = self.frame
-
-        current_time = time.perf_counter() 
-        
-        if self.fps == 0:
-            self.prev_time = current_time
-            return output
-
-        while current_time - self.prev_time < 1/self.fps:
-            current_time = time.perf_counter()
-
-        self.prev_time = current_time
-        return output
-    
-    def get_num_channels(self) -> Optional[int]:
-        return 1
\ No newline at end of file
+    OUTPUT_FORMAT = 'gray'
@@ -1,4 +1,5 @@
-from camera_tools.camera import Camera, CameraInfo
+from camera_tools.camera import Camera, CameraInfo, FrameBatch, frame_dtype
+from camera_tools.frame_pacer import FramePacer
 import time
 import numpy as np
 from numpy.typing import NDArray, ArrayLike
@@ -6,6 +7,9 @@ from typing import Optional, Tuple, List
 
 class RandomCam(Camera):
 
+    # unpaced by default, frames are produced as fast as they are generated
+    DEFAULT_FPS: float = 0
+
     @classmethod
     def list_available_cameras(cls) -> List[CameraInfo]:
         return [
@@ -28,44 +32,89 @@ class RandomCam(Camera):
         super().__init__(*args,**kwargs)
 
         self.img_count: int = 0
-        self.time_start: float = time.perf_counter()
+        self.time_start_ns: int = time.perf_counter_ns()
         self.shape = shape 
         self.dtype = dtype
+        self.pacer = FramePacer(self.DEFAULT_FPS)
 
     def get_frame(self) -> NDArray:
 
-        self.img_count += 1
-        timestamp = time.perf_counter() - self.time_start
+        frame = self._new_frame(self._get_frame_dtype())
+        return self.get_frame_into(frame)
+
+    def _get_frame_dtype(self) -> np.dtype:
+        if self._frame_dtype is None:
+            self._frame_dtype = frame_dtype(self.dtype, tuple(self.shape))
+        return self._frame_dtype
+
+    def _random_images(self, shape: Tuple[int, ...]) -> NDArray:
 
         if np.issubdtype(self.dtype, np.integer):
             type_inf = np.iinfo(self.dtype)
             min_val = 0
             max_val = type_inf.max
-            img = np.random.randint(min_val, max_val, self.shape, dtype=self.dtype)
+            return np.random.randint(min_val, max_val, shape, dtype=self.dtype)
         
         elif np.issubdtype(self.dtype, np.floating):
-            img = np.random.uniform(0.0, 1.0, self.shape).astype(self.dtype)
+            return np.random.uniform(0.0, 1.0, shape)
         
         else:
             raise TypeError
-        
-        frame = np.array(
-            (self.img_count, timestamp, img),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', img.dtype, img.shape)
-            ])
-        )
-        return frame
+
+    def get_frame_into(self, out: NDArray) -> NDArray:
+
+        out['image'] = self._random_images(self.shape)
+        deadline_ns = self.pacer.wait()
+        self.img_count += 1
+        host_timestamp_ns = time.perf_counter_ns()
+
+        out['index'] = self.img_count
+        out['timestamp_ns'] = deadline_ns - self.time_start_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
+        return out
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> FrameBatch:
+
+        if out is None:
+            out = FrameBatch.empty(num_frames, self._get_frame_dtype())
+        elif len(out) < num_frames:
+            raise ValueError(f'FrameBatch too small for {num_frames} frames')
+
+        out.image[:num_frames] = self._random_images((num_frames, *self.shape))
+
+        if self.pacer.fps == 0:
+            host_timestamp_ns = time.perf_counter_ns()
+            out.index[:num_frames] = np.arange(self.img_count + 1, self.img_count + num_frames + 1)
+            out.timestamp_ns[:num_frames] = host_timestamp_ns - self.time_start_ns
+            out.host_timestamp_ns[:num_frames] = host_timestamp_ns
+            self.img_count += num_frames
+            for index in out.index[:num_frames]:
+                self._update_stats(int(index))
+            return out[:num_frames]
+
+        # images are generated upfront, frames are released on schedule
+        for i in range(num_frames):
+            deadline_ns = self.pacer.wait()
+            host_timestamp_ns = time.perf_counter_ns()
+            self.img_count += 1
+            out.index[i] = self.img_count
+            out.timestamp_ns[i] = deadline_ns - self.time_start_ns
+            out.host_timestamp_ns[i] = host_timestamp_ns
+            self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
+        return out[:num_frames]
     
     def start_acquisition(self) -> None:
         self.index = 0
-        self.time_start = time.perf_counter()
+        self.time_start_ns = time.perf_counter_ns()
+        self.pacer.reset()
 
     def stop_acquisition(self) -> None:
         pass
 
+    def exposure_available(self) -> bool:
+        return False
+
     def set_exposure(self, exp_time: float) -> None:
         pass
 
@@ -78,17 +127,23 @@ class RandomCam(Camera):
     def get_exposure_increment(self) -> Optional[float]:
         pass
 
+    def framerate_available(self) -> bool:
+        return True
+
     def set_framerate(self, fps: float) -> None:
-        pass
+        self.pacer.set_framerate(fps)
 
     def get_framerate(self) -> Optional[float]:
-        pass
+        return self.pacer.fps
 
     def get_framerate_range(self) -> Optional[Tuple[float,float]]:
-        pass
+        return (0,1000)
 
     def get_framerate_increment(self) -> Optional[float]:
-        pass
+        return 1
+
+    def gain_available(self) -> bool:
+        return False
 
     def set_gain(self, gain: float) -> None:
         pass
@@ -102,12 +157,18 @@ class RandomCam(Camera):
     def get_gain_increment(self) -> Optional[float]:
         pass
 
+    def ROI_available(self) -> bool:
+        return False
+
     def set_ROI(self, left: int, bottom: int, height: int, width: int) -> None:
         pass
 
     def get_ROI(self) -> Optional[Tuple[int,int,int,int]]:
         pass
 
+    def offsetX_available(self) -> bool:
+        return False
+
     def set_offsetX(self, offsetX: int) -> None:
         pass
 
@@ -120,6 +181,9 @@ class RandomCam(Camera):
     def get_offsetX_increment(self) -> Optional[int]:
         pass
 
+    def offsetY_available(self) -> bool:
+        return False
+
     def set_offsetY(self, offsetY: int) -> None:
         pass
 
@@ -132,6 +196,9 @@ class RandomCam(Camera):
     def get_offsetY_increment(self) -> Optional[int]:
         pass
 
+    def width_available(self) -> bool:
+        return False
+
     def set_width(self, width: int) -> None:
         pass
 
@@ -144,6 +211,9 @@ class RandomCam(Camera):
     def get_width_increment(self) -> Optional[int]:
         pass 
     
+    def height_available(self) -> bool:
+        return False
+
     def set_height(self, height) -> None:
         pass
     
@@ -164,4 +234,4 @@ class RandomCam(Camera):
         return num_channels
     
     def close(self) -> None:
-        ...
\ No newline at end of file
+        super().close()
\ No newline at end of file
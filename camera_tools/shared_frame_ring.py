@@ -0,0 +1,186 @@
+from multiprocessing import shared_memory, resource_tracker
+import sys
+import numpy as np
+from numpy.typing import NDArray, DTypeLike
+from typing import Optional, Tuple
+from camera_tools.camera import Camera
+
+HEADER_DTYPE = np.dtype([
+    ('write_count', np.int64),
+    ('latest_slot', np.int64)
+])
+CACHE_LINE = 64
+HEADER_SIZE = CACHE_LINE # keep slots cache-line aligned
+
+class SharedMemoryFrameRing:
+    '''
+    Ring of structured frames in shared memory, written by one acquisition
+    process and read zero-copy from any number of processes.
+
+    Each slot is guarded by a sequence counter (seqlock): the writer makes it
+    odd while a slot is being written and even once the frame is complete,
+    readers never take a lock. Rings are picklable, unpickling attaches to
+    the same shared memory block in the receiving process.
+    '''
+
+    def __init__(
+            self,
+            dtype: DTypeLike,
+            num_slots: int = 16,
+            name: Optional[str] = None,
+            create: bool = True
+        ) -> None:
+
+        if num_slots < 1:
+            raise ValueError('num_slots must be at least 1')
+
+        self.dtype = np.dtype(dtype)
+        self.num_slots = num_slots
+        # slots are padded to whole cache lines so that every sequence 
+        # counter is an aligned word: its updates are atomic
+        slot_size = 8 + self.dtype.itemsize
+        self.slot_dtype = np.dtype({
+            'names': ['sequence', 'frame'],
+            'formats': [np.int64, self.dtype],
+            'offsets': [0, 8],
+            'itemsize': -(-slot_size // CACHE_LINE) * CACHE_LINE
+        })
+        self.owner = create
+
+        size = HEADER_SIZE + num_slots * self.slot_dtype.itemsize
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        elif sys.version_info >= (3, 13):
+            # attached blocks must not be unlinked when this process exits
+            self.shm = shared_memory.SharedMemory(name=name, size=size, track=False)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, size=size)
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+        self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        self.slots = np.ndarray(
+            (num_slots,),
+            dtype=self.slot_dtype,
+            buffer=self.shm.buf,
+            offset=HEADER_SIZE
+        )
+        self.sequences = self.slots['sequence']
+        self.frames = self.slots['frame']
+
+        if create:
+            self.header['write_count'] = 0
+            self.header['latest_slot'] = -1
+            self.sequences[:] = 0
+            self.frames['index'] = -1
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __reduce__(self):
+        return (self.__class__, (self.dtype, self.num_slots, self.name, False))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    def _begin_write(self) -> int:
+        slot = int(self.header['write_count'] % self.num_slots)
+        self.sequences[slot] += 1
+        return slot
+
+    def _end_write(self, slot: int) -> None:
+        self.sequences[slot] += 1
+        self.header['latest_slot'] = slot
+        self.header['write_count'] += 1
+
+    def publish(self, frame: NDArray) -> int:
+        '''
+        Copy a frame into the next slot, returns the frame index
+        '''
+        slot = self._begin_write()
+        self.frames[slot] = frame
+        self._end_write(slot)
+        return int(frame['index'])
+
+    def publish_from(self, camera: Camera) -> Optional[int]:
+        '''
+        Acquire the next frame of camera directly into the next slot.
+        Returns the frame index, or None if no frame was available.
+        '''
+        slot = self._begin_write()
+        frame = camera.get_frame_into(self.frames[slot, ...])
+        if frame is None:
+            # leave the slot marked as invalid
+            self.frames['index'][slot] = -1
+            self.sequences[slot] += 1
+            return None
+        self._end_write(slot)
+        return int(frame['index'])
+
+    def latest_index(self) -> Optional[int]:
+        slot = int(self.header['latest_slot'])
+        if slot < 0:
+            return None
+        return int(self.frames[slot]['index'])
+
+    def _find_slot(self, index: int) -> Optional[int]:
+        slots = np.flatnonzero(self.frames['index'] == index)
+        if slots.size == 0:
+            return None
+        return int(slots[0])
+
+    def get(self, index: int) -> Optional[Tuple[NDArray, int]]:
+        '''
+        Zero-copy view on the frame with the given index and the sequence
+        number of its slot, or None if the frame is not in the ring. Call
+        is_valid once done with the view to make sure it was not overwritten.
+        '''
+        slot = self._find_slot(index)
+        if slot is None:
+            return None
+
+        sequence = int(self.sequences[slot])
+        if sequence % 2 == 1:
+            return None
+
+        view = self.frames[slot, ...]
+        if view['index'] != index:
+            return None
+
+        return view, sequence
+
+    def is_valid(self, index: int, sequence: int) -> bool:
+        slot = self._find_slot(index)
+        if slot is None:
+            return False
+        return int(self.sequences[slot]) == sequence
+
+    def copy(self, index: int, max_retry: int = 3) -> Optional[NDArray]:
+        '''
+        Consistent copy of the frame with the given index
+        '''
+        for _ in range(max_retry):
+            res = self.get(index)
+            if res is None:
+                return None
+            view, sequence = res
+            frame = view.copy()
+            if self.is_valid(index, sequence):
+                return frame
+        # overwritten during every attempt
+        return None
+
+    def close(self) -> None:
+        self.header = None
+        self.slots = None
+        self.sequences = None
+        self.frames = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        self.shm.unlink()
@@ -1,11 +1,15 @@
-from camera_tools.camera import Camera, CameraInfo
-from typing import Optional, Tuple, List
+from camera_tools.camera import Camera, CameraInfo, frame_dtype
+from typing import Optional, Tuple, List, Dict, Any
 import PySpin
 from numpy.typing import NDArray
 import numpy as np
+import time
 
 class SpinnakerCamera(Camera):
 
+    SETTINGS = Camera.SETTINGS + ('pixel_format', 'binning')
+    PIXEL_FORMATS = ('Mono8', 'Mono10', 'Mono12', 'Mono16')
+
     @classmethod
     def list_available_cameras(cls) -> List[CameraInfo]:
         ...
@@ -21,6 +25,7 @@ class SpinnakerCamera(Camera):
         self.first_frame = True
         self.first_num = 0
         self.first_timestamp = 0
+        self.acquisition_started = False
 
         # open camera
         self.cam = self.cam_list[dev_id]
@@ -37,9 +42,42 @@ class SpinnakerCamera(Camera):
 
     def start_acquisition(self) -> None:
         self.cam.BeginAcquisition()
+        self.acquisition_started = True
     
     def stop_acquisition(self) -> None:
         self.cam.EndAcquisition()
+        self.acquisition_started = False
+
+    def _set_pixel_format(self, pixel_format: str) -> None:
+        if pixel_format not in self.PIXEL_FORMATS:
+            raise ValueError(f'Unsupported pixel format {pixel_format}')
+        self.cam.PixelFormat.SetValue(getattr(PySpin, f'PixelFormat_{pixel_format}'))
+        self.invalidate_capabilities()
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return self.cam.PixelFormat.GetCurrentEntry().GetSymbolic()
+
+    def _set_binning(self, horizontal: int, vertical: int) -> None:
+        try:
+            self.cam.BinningHorizontal.SetValue(int(horizontal))
+            self.cam.BinningVertical.SetValue(int(vertical))
+        except PySpin.SpinnakerException as e:
+            print(f"Could not set binning: {e}")
+        self.invalidate_capabilities()
+
+    def _get_binning(self) -> Optional[Tuple[int, int]]:
+        return (self.cam.BinningHorizontal.GetValue(), self.cam.BinningVertical.GetValue())
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        # image format and size nodes are locked while streaming
+        restart = self.acquisition_started and any(
+            name in settings for name in self.LAYOUT_SETTINGS
+        )
+        if restart:
+            self.stop_acquisition()
+        super()._apply_settings(settings)
+        if restart:
+            self.start_acquisition()
 
     def exposure_available(self) -> bool:
         return True
@@ -114,11 +152,16 @@ class SpinnakerCamera(Camera):
         pass
 
     def set_offsetX(self, offsetX: int) -> None:
+        clamped_offsetX = self.get_capabilities().clamp('offsetX', offsetX)
+
         try:
-            self.cam.OffsetX.SetValue(int(offsetX))
+            self.cam.OffsetX.SetValue(int(clamped_offsetX))
         except PySpin.SpinnakerException:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('width')
+
     def offsetX_available(self) -> bool:
         return True
     
@@ -137,11 +180,16 @@ class SpinnakerCamera(Camera):
             return 1
 
     def set_offsetY(self, offsetY: int) -> None:
+        clamped_offsetY = self.get_capabilities().clamp('offsetY', offsetY)
+
         try:
-            self.cam.OffsetY.SetValue(int(offsetY))
+            self.cam.OffsetY.SetValue(int(clamped_offsetY))
         except PySpin.SpinnakerException:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('height')
+
     def offsetY_available(self) -> bool:
         return True
     
@@ -163,11 +211,16 @@ class SpinnakerCamera(Camera):
         return True
     
     def set_width(self, width: int) -> None:
+        clamped_width = self.get_capabilities().clamp('width', width)
+
         try:
-            self.cam.Width.SetValue(int(width))
+            self.cam.Width.SetValue(int(clamped_width))
         except PySpin.SpinnakerException:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('offsetX', 'framerate')
+
     def get_width(self) -> Optional[int]:
         return self.cam.Width.GetValue()
 
@@ -186,10 +239,15 @@ class SpinnakerCamera(Camera):
         return True
     
     def set_height(self, height: int) -> None:
+        clamped_height = self.get_capabilities().clamp('height', height)
+
         try:
-            self.cam.Height.SetValue(int(height))
+            self.cam.Height.SetValue(int(clamped_height))
         except PySpin.SpinnakerException:
             pass
+
+        # ranges depending on this parameter
+        self.invalidate_capabilities('offsetY', 'framerate')
         
     def get_height(self) -> Optional[int]:
         return self.cam.Height.GetValue()   
@@ -205,30 +263,44 @@ class SpinnakerCamera(Camera):
         except PySpin.SpinnakerException:
             return 1
 
-    def get_frame(self) -> NDArray:
-        image_result = self.cam.GetNextImage()
-        pixeldata = image_result.GetNDArray()
-
+    def _fill_frame(self, out: NDArray, image_result, pixeldata: NDArray) -> NDArray:
+        host_timestamp_ns = time.perf_counter_ns()
         im_num = image_result.GetFrameID()
-        ts_nsec = image_result.GetTimeStamp()
-        timestamp = ts_nsec*1e-9
+        timestamp_ns = image_result.GetTimeStamp()
         if self.first_frame:
             self.first_frame = False
             self.first_num = im_num
-            self.first_timestamp = timestamp
-
-        frame = np.array(
-            (im_num-self.first_num, timestamp-self.first_timestamp, pixeldata),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', pixeldata.dtype, pixeldata.shape)
-            ])
+            self.first_timestamp = timestamp_ns
+
+        out['index'] = im_num-self.first_num
+        out['timestamp_ns'] = timestamp_ns-self.first_timestamp
+        out['host_timestamp_ns'] = host_timestamp_ns
+        out['image'] = pixeldata
+
+        self._update_stats(
+            im_num-self.first_num, 
+            timestamp_ns-self.first_timestamp, 
+            host_timestamp_ns,
+            incomplete = image_result.IsIncomplete()
         )
+        return out
+
+    def get_frame(self) -> NDArray:
+        image_result = self.cam.GetNextImage()
+        pixeldata = image_result.GetNDArray()
+
+        frame = self._new_frame(frame_dtype(pixeldata.dtype, pixeldata.shape))
+        self._fill_frame(frame, image_result, pixeldata)
 
         image_result.Release()
         return frame
 
+    def get_frame_into(self, out: NDArray) -> NDArray:
+        image_result = self.cam.GetNextImage()
+        self._fill_frame(out, image_result, image_result.GetNDArray())
+        image_result.Release()
+        return out
+
     def get_num_channels(self) -> int:
         # TODO  imgdataformat = cam.get_imgdataformat()
         return 1
@@ -240,6 +312,7 @@ class SpinnakerCamera(Camera):
         self.cam = None
         self.cam_list.Clear()
         self.system.ReleaseInstance()
+        super().close()
 
     def __del__(self) -> None:
         try:
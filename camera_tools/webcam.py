@@ -1,11 +1,13 @@
 
-from camera_tools.camera import Camera, CameraInfo
+from camera_tools.camera import Camera, CameraInfo, frame_dtype, OUTPUT_FORMATS
+from camera_tools.latest_frame import LatestFrameGrabber
+from camera_tools.config_cache import ConfigCache, video_device_identity
+from camera_tools.mjpeg_decoder import MJPEGDecoder
 import cv2 
 import time
 from numpy.typing import NDArray
-from typing import Optional, Tuple, Dict, List
+from typing import Optional, Tuple, Dict, List, Any
 import numpy as np
-from image_tools import im2gray
 import sys
 
 # NOTE this is just a hack, OpenCV webacm control is very superficial 
@@ -15,14 +17,19 @@ import sys
 #   v4l2-ctl -d /dev/video0 --list-ctrls-menus
 
 # NOTE the constructor is very slow on windows (get_supported_configs)
-# this also not very efficient on linux. Find a way to get supported
-# format faster 
+# this also not very efficient on linux. Probed configs are cached on
+# disk per device (see config_cache) so that this only happens once
 
 # TODO handle format selection in the __init__
 
 class OpenCV_Webcam(Camera):
 
     SAFE_MODE: bool = False
+    SETTINGS = ('pixel_format', 'width', 'height', 'framerate')
+    CONFIG_CACHE = ConfigCache()
+    OUTPUT_FORMAT: str = 'rgb'
+    # packed YUV 4:2:2 formats storing luma in even bytes
+    LUMA_FORMATS = ('YUYV', 'YUY2')
 
     COMMON_RESOLUTIONS = [
         (320, 240),    # QVGA
@@ -70,39 +77,77 @@ class OpenCV_Webcam(Camera):
     def __init__(
             self, 
             cam_id: int = 0, 
+            use_config_cache: bool = True,
+            mjpeg_decode_threads: int = 0,
+            output_format: Optional[str] = None,
             *args, 
             **kwargs
         ) -> None:
+        '''
+        With mjpeg_decode_threads > 0 and the MJPG format, compressed frames
+        are decoded on that many threads instead of inside read().
+        output_format is one of OUTPUT_FORMATS (OUTPUT_FORMAT by default), 
+        native is OpenCV's BGR.
+        '''
         
         super().__init__(*args, **kwargs)
 
+        if output_format is None:
+            output_format = self.OUTPUT_FORMAT
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'Unsupported output format {output_format}')
+        self.output_format = output_format
+        self.mjpeg_decode_threads = mjpeg_decode_threads
+        self.decoder: Optional[MJPEGDecoder] = None
         self.backend = cv2.CAP_DSHOW if sys.platform.startswith("win") else cv2.CAP_ANY 
         self.camera_id = cam_id
         self.camera = cv2.VideoCapture(self.camera_id, self.backend) 
         self.index = 0
-        self.time_start = time.perf_counter()
+        self.time_start_ns = time.perf_counter_ns()
         self.supported_formats = {}
         self.supported_configs = {}
         self.supported_configs_list = []
         self._width = None
         self._height = None
-        self.get_supported_configs()
-        if self.supported_configs_list:
-            self.current_config = self.supported_configs_list[-1]
-            self.set_config(
-                self.current_config['fourcc'],
-                self.current_config['width'],
-                self.current_config['height'],
-                self.current_config['fps']
-            )
+        self.use_config_cache = use_config_cache
+
+        configs = self.CONFIG_CACHE.get(self.config_cache_key()) if use_config_cache else None
+        if configs:
+            self._load_configs(configs)
+            if not self._set_default_config():
+                # probed on another device: devices are only identified by
+                # their index off Linux, a different webcam can sit there
+                self.refresh_supported_configs()
+                self._set_default_config()
         else:
+            self.refresh_supported_configs()
+            self._set_default_config()
+
+        if not self.supported_configs_list:
             RuntimeError('No supported camera config found')
 
+    def _set_default_config(self) -> bool:
+        '''
+        Apply the last supported config, returns False if the device 
+        did not accept it
+        '''
+        if not self.supported_configs_list:
+            return False
+        self.current_config = self.supported_configs_list[-1]
+        self.set_config(
+            self.current_config['fourcc'],
+            self.current_config['width'],
+            self.current_config['height'],
+            self.current_config['fps']
+        )
+        config = self.get_config()
+        return all(config[name] == self.current_config[name] for name in ('fourcc', 'width', 'height', 'fps'))
+
     def _reset(self):
         self.camera.release()
         self.camera = cv2.VideoCapture(self.camera_id, self.backend)
         self.index = 0
-        self.time_start = time.perf_counter()
+        self.time_start_ns = time.perf_counter_ns()
         self.set_config(
             self.current_config['fourcc'],
             self.current_config['width'],
@@ -111,19 +156,112 @@ class OpenCV_Webcam(Camera):
         )
 
         # preallocate memory
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.current_config['height'], self.current_config['width'], 3))
-            ])
-        )
+        self.frame = np.empty((), dtype=self._get_frame_dtype())
+        self._set_raw_output()
+
+    def _set_raw_output(self) -> None:
+        # BGR, or raw YUYV for luma extraction, sized by the first read
+        self.decoded = None
+        # get the raw YUYV buffer and keep the Y plane, instead of 
+        # converting to BGR and back to gray. Depends on the format: 
+        # recomputed whenever the config changes
+        raw = self.get_output_format() == 'gray' and self.current_config['format'] in self.LUMA_FORMATS
+        self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 0 if raw else 1)
+
+    def get_output_format(self) -> str:
+        '''
+        Layout of the images: rgb, bgr or gray
+        '''
+        return 'bgr' if self.output_format == 'native' else self.output_format
+
+    def _get_frame_dtype(self) -> np.dtype:
+        shape = (self.current_config['height'], self.current_config['width'])
+        if self.get_num_channels() > 1:
+            shape += (self.get_num_channels(),)
+        return frame_dtype(np.uint8, shape, self.get_output_format())
+
+    def _read(self) -> Tuple[bool, Optional[NDArray]]:
+        # OpenCV decodes into the buffer passed as image when its layout 
+        # matches and allocates a new one otherwise: keep whichever was 
+        # used for the next frame
+        ret, img = self.camera.read(image=self.decoded)
+        if ret:
+            self.decoded = img
+        return ret, img
+
+    def _read_into(self, out: NDArray) -> bool:
+        # one write into the frame whatever the output format
+        image = out['image']
+        output_format = self.get_output_format()
+
+        if output_format == 'bgr':
+            # OpenCV's own layout: decode straight into the frame
+            ret, img = self.camera.read(image=image)
+            if ret and img is not image:
+                out['image'] = img
+            return ret
+
+        ret, img = self._read()
+        if not ret:
+            return ret
+        if output_format == 'rgb':
+            if cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=image) is not image:
+                # layouts differ, cvtColor allocated its own output
+                out['image'] = img[:,:,::-1]
+        else:
+            self._copy_luma(img, image)
+        return ret
+
+    def _copy_luma(self, img: NDArray, out: NDArray) -> None:
+        height, width = out.shape
+        if img.size == height*width*2:
+            # raw YUYV, whether OpenCV returns it as (1, N) bytes or (H, W, 2)
+            np.copyto(out, img.reshape(height, 2*width)[:, 0::2])
+        elif img.ndim == 3:
+            # BGR, the backend ignored CAP_PROP_CONVERT_RGB or the format
+            # has no luma plane
+            cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=out)
+        else:
+            np.copyto(out, img)
 
     def start_acquisition(self) -> None:
+        self._stop_decoder()
         self._reset()
+        self._start_decoder()
 
     def stop_acquisition(self) -> None:
-        pass
+        self._stop_decoder()
+
+    def _start_decoder(self) -> None:
+        if self.mjpeg_decode_threads < 1:
+            return
+        if self.current_config['format'] != 'MJPG':
+            raise ValueError('MJPEG decoding requires the MJPG pixel format')
+        # read() returns the compressed payload instead of decoding it
+        self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self.decoder = MJPEGDecoder(
+            self._grab_jpeg,
+            self.current_config['height'],
+            self.current_config['width'],
+            output_format = self.get_output_format(),
+            num_workers = self.mjpeg_decode_threads
+        )
+        self.decoder.start()
+
+    def _stop_decoder(self) -> None:
+        if self.decoder is not None:
+            self.decoder.stop()
+            self.decoder = None
+
+    def _grab_jpeg(self):
+        ret, jpeg = self.camera.read()
+        if not ret:
+            return None
+        if jpeg.ndim == 3:
+            raise RuntimeError('This OpenCV backend does not give access to compressed MJPEG frames')
+        self.index += 1
+        host_timestamp_ns = time.perf_counter_ns()
+        return (self.index, host_timestamp_ns - self.time_start_ns, host_timestamp_ns, jpeg)
     
     def set_config(self, fourcc: int, width: int, height: int, fps: float) -> None:
         self.camera.set(cv2.CAP_PROP_FOURCC, fourcc)
@@ -141,6 +279,68 @@ class OpenCV_Webcam(Camera):
         res = {'format': format, 'fourcc': fourcc, 'width': width, 'height': height, 'fps': fps}
         return res
 
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        # format, resolution and framerate only make sense together:
+        # resolve the full config and send it once 
+        format = settings.get('pixel_format', self.current_config['format'])
+        width = settings.get('width', self.current_config['width'])
+        height = settings.get('height', self.current_config['height'])
+        fps = settings.get('framerate', self.current_config['fps'])
+
+        try:
+            valid_fps = self.supported_configs[format][width][height]
+        except KeyError:
+            raise ValueError(f'Unsupported config {format} {width}x{height}')
+        if fps not in valid_fps:
+            raise ValueError(f'Unsupported framerate {fps} for {format} {width}x{height}')
+        if self.decoder is not None and format != 'MJPG':
+            raise ValueError('MJPEG decoding requires the MJPG pixel format')
+
+        self._reconfigure(cv2.VideoWriter_fourcc(*format), width, height, fps)
+
+    def _reconfigure(self, fourcc: int, width: int, height: int, fps: float) -> None:
+        # the decoder reads from the capture and is sized for the current
+        # resolution: stop it while the config changes
+        decoding = self.decoder is not None
+        self._stop_decoder()
+        self.set_config(fourcc, width, height, fps)
+        self.current_config = self.get_config()
+        self.frame = np.empty((), dtype=self._get_frame_dtype())
+        self._set_raw_output()
+        if decoding:
+            self._start_decoder()
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return self.current_config['format']
+
+    def config_cache_key(self) -> str:
+        # the same device can report different configs through different backends
+        return f'{self.backend}/{video_device_identity(self.camera_id)}'
+
+    def refresh_supported_configs(self) -> None:
+        '''
+        Probe the device again and update the on-disk cache
+        '''
+        self.supported_formats = {}
+        self.supported_configs = {}
+        self.supported_configs_list = []
+        self.get_supported_configs()
+        if self.use_config_cache and self.supported_configs_list:
+            self.CONFIG_CACHE.set(self.config_cache_key(), self.supported_configs_list)
+
+    def invalidate_config_cache(self) -> None:
+        '''
+        Forget the cached configs of this device, the next instance probes again
+        '''
+        self.CONFIG_CACHE.invalidate(self.config_cache_key())
+
+    def _load_configs(self, configs: List[Dict]) -> None:
+        self.supported_configs_list = configs
+        for config in configs:
+            self.supported_formats[config['fourcc']] = config['format']
+            valid_fps = self.supported_configs.setdefault(config['format'], {}).setdefault(config['width'], {}).setdefault(config['height'], [])
+            valid_fps.append(config['fps'])
+
     def get_supported_formats(self):
         for fourcc, format_name in self.COMMON_FORMATS.items():
             if self.camera.set(cv2.CAP_PROP_FOURCC, fourcc):
@@ -169,19 +369,50 @@ class OpenCV_Webcam(Camera):
                         self.supported_configs[format_name][width] = {}
                     self.supported_configs[format_name][width][height] = valid_fps
                 
-    def get_frame(self) -> NDArray:
-        ret, img = self.camera.read()
+    def _get_decoded_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        if self.decoder.get_frame_into(out) is None:
+            return None
+        self._update_stats(int(out['index']))
+        return out
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        if self.decoder is not None:
+            return self._get_decoded_frame_into(out)
+
+        if not self._read_into(out):
+            return None
         self.index += 1
-        timestamp = time.perf_counter() - self.time_start
+        host_timestamp_ns = time.perf_counter_ns()
+
+        out['index'] = self.index
+        out['timestamp_ns'] = host_timestamp_ns - self.time_start_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        self._update_stats(self.index)
+        return out
+
+    def get_frame(self) -> Optional[NDArray]:
+        if self.frame_pool is not None:
+            frame = self._new_frame(self.frame.dtype)
+            if self.get_frame_into(frame) is None:
+                self.release_frame(frame)
+                return None
+            return frame
+
+        if self.decoder is not None:
+            # the decoder's ring already holds the frame
+            frame = self.decoder.get_frame()
+            if frame is not None:
+                self._update_stats(int(frame['index']))
+        else:
+            frame = self.get_frame_into(self.frame)
 
-        self.frame['index'] = self.index
-        self.frame['timestamp'] = timestamp
-        self.frame['image'] = img[:,:,::-1] # bgr to rgb
+        if frame is None:
+            return None
         
         if self.SAFE_MODE:
-            output = self.frame.copy()
+            output = frame.copy()
         else:
-            output = self.frame
+            output = frame
 
         return output 
     
@@ -205,13 +436,12 @@ class OpenCV_Webcam(Camera):
     
     def set_framerate(self, fps: float) -> None:
         if self.camera is not None:
-            self.set_config(
+            self._reconfigure(
                 self.current_config['fourcc'],
                 self.current_config['width'],
                 self.current_config['height'],
                 fps
             )
-        self.current_config = self.get_config()
        
     def get_framerate(self) -> Optional[float]:
         if self.camera is not None:
@@ -292,17 +522,7 @@ class OpenCV_Webcam(Camera):
         if height not in config_height.keys():
             return
         
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-
-        self.current_config = self.get_config()
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.current_config['height'], self.current_config['width'], 3))
-            ])
-        )
+        self._reconfigure(config['fourcc'], width, height, config['fps'])
     
     def set_width(self, width: int) -> None:
         
@@ -346,11 +566,13 @@ class OpenCV_Webcam(Camera):
         return 2 
     
     def get_num_channels(self) -> int:
-        return 3
+        return 1 if self.get_output_format() == 'gray' else 3
 
     def close(self) -> None:
+        self._stop_decoder()
         if self.camera is not None:
             self.camera.release()
+        super().close()
 
     def __del__(self):
         try:
@@ -365,100 +587,82 @@ class OpenCV_Webcam_InitEveryFrame(OpenCV_Webcam):
     # workaround to clear buffer and always get last frame. 
     # this is a bit slow 
 
-    def get_frame(self) -> NDArray:
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
         
-        self.start_acquisition()
-        ret, img = self.camera.read()
-        self.stop_acquisition()
+        # reopening the device for every frame leaves nothing to decode in parallel
+        self._reset()
+        if not self._read_into(out):
+            return None
 
         self.index += 1
-        timestamp = time.perf_counter() - self.time_start
+        host_timestamp_ns = time.perf_counter_ns()
 
-        self.frame['index'] = self.index
-        self.frame['timestamp'] = timestamp
-        self.frame['image'] = img[:,:,::-1] # bgr to rgb
-        
-        if self.SAFE_MODE:
-            output = self.frame.copy()
-        else:
-            output = self.frame
-
-        return output 
+        out['index'] = self.index
+        out['timestamp_ns'] = host_timestamp_ns - self.time_start_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        self._update_stats(self.index)
+        return out
 
 class OpenCV_Webcam_Gray(OpenCV_Webcam):
 
-    def start_acquisition(self) -> None:
-        self.camera.release()
-        self.camera = cv2.VideoCapture(self.camera_id, self.backend)
-        self.index = 0
-        self.time_start = time.perf_counter()
-        self.set_config(
-            self.current_config['fourcc'],
-            self.current_config['width'],
-            self.current_config['height'],
-            self.current_config['fps']
-        )
+    OUTPUT_FORMAT = 'gray'
 
-        # preallocate memory
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.current_config['height'], self.current_config['width']))
-            ])
-        )
+class OpenCV_Webcam_LastFrame(OpenCV_Webcam):
 
-    def get_frame(self):
-        ret, img = self.camera.read()
-        img_gray = im2gray(img)
-        self.index += 1
-        timestamp = time.perf_counter() - self.time_start
+    # workaround to clear buffer and always get last frame. 
+    # constantly get images in a separate thread in a loop, 
+    # and keep only the most recent one (see LatestFrameCamera
+    # to do the same with any camera).
 
-        self.frame['index'] = self.index
-        self.frame['timestamp'] = timestamp
-        self.frame['image'] = img_gray
+    def start_acquisition(self) -> None:
+        self.stop_acquisition()
+        super().start_acquisition()
+        # the grabber reads through OpenCV_Webcam directly: the overrides 
+        # below wait on the grabber itself
+        read_into = lambda out: OpenCV_Webcam.get_frame_into(self, out)
+        self.grabber = LatestFrameGrabber(
+            lambda: read_into(np.empty((), dtype=self.frame.dtype)),
+            read_into
+        )
+        self.grabber.start()
 
+    def stop_acquisition(self) -> None:
+        if getattr(self, 'grabber', None) is not None:
+            self.grabber.stop()
+            self.grabber = None
+        super().stop_acquisition()
+
+    def get_frame_into(self, out: NDArray) -> Optional[NDArray]:
+        frame = self.grabber.latest()
+        if frame is None:
+            return None
+        for name in frame.dtype.names:
+            out[name] = frame[name]
+        return out
+
+    def get_frame(self) -> Optional[NDArray]:
+        if self.frame_pool is not None:
+            frame = self._new_frame(self.frame.dtype)
+            if self.get_frame_into(frame) is None:
+                self.release_frame(frame)
+                return None
+            return frame
+
+        frame = self.grabber.latest()
+        if frame is None:
+            return None
+        
         if self.SAFE_MODE:
-            output = self.frame.copy()
+            output = frame.copy()
         else:
-            output = self.frame
+            output = frame
 
         return output 
 
-    def get_num_channels(self) -> int:
-        return 1
-
-    def set_resolution(self, width: int, height: int):
-        config = self.get_config()
-        
-        config_width = self.supported_configs[config['format']]
-        if width not in config_width.keys():
-            return
-        
-        config_height = config_width[width]
-        if height not in config_height.keys():
-            return
-        
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-
-        self.current_config = self.get_config()
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.current_config['height'], self.current_config['width']))
-            ])
-        )
-
-    
-
-class OpenCV_Webcam_LastFrame(OpenCV_Webcam):
-
-    # workaround to clear buffer and always get last frame. 
-    # constantly get images in a separate thread in a loop, 
-    # and overwrite a single variable.
-    pass
+    def close(self) -> None:
+        if getattr(self, 'grabber', None) is not None:
+            self.grabber.stop()
+        super().close()
 
 def get_cam_properties():
     VIDEO_CAPTURE_PROPERTIES = {
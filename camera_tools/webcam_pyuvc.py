@@ -1,8 +1,10 @@
 import uvc
 from uvc.uvc_bindings import CameraMode
 import numpy as np
+import time
 from numpy.typing import NDArray
-from camera_tools.camera import Camera, CameraInfo
+from camera_tools.camera import Camera, CameraInfo, frame_dtype, OUTPUT_FORMATS
+from camera_tools.mjpeg_decoder import MJPEGDecoder
 from typing import Optional, Tuple, Dict, List
 
 class PyUVC_Webcam(Camera):
@@ -11,10 +13,28 @@ class PyUVC_Webcam(Camera):
     def list_available_cameras(cls) -> List[CameraInfo]:
         ...
 
-    def __init__(self, cam_index: int = 0, safe: bool = False, *args, **kwargs):
+    def __init__(
+            self, 
+            cam_index: int = 0, 
+            safe: bool = False, 
+            mjpeg_decode_threads: int = 0, 
+            output_format: str = 'rgb',
+            *args, 
+            **kwargs
+        ):
+        '''
+        With mjpeg_decode_threads > 0 and an MJPG mode, frames are decoded
+        on that many threads instead of by pyuvc.
+        output_format is one of OUTPUT_FORMATS, native is BGR.
+        '''
         super().__init__(*args, **kwargs)
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'Unsupported output format {output_format}')
+        self.output_format = output_format
         self.safe = safe
         self.index = 0
+        self.mjpeg_decode_threads = mjpeg_decode_threads
+        self.decoder: Optional[MJPEGDecoder] = None
 
         dev_list = uvc.device_list()
         if not dev_list:
@@ -28,13 +48,19 @@ class PyUVC_Webcam(Camera):
         self.set_mode(self.camera.available_modes[-1])
 
         # Preallocate frame storage
-        self.frame = np.empty((),
-            dtype=np.dtype([
-                ('index', int),
-                ('timestamp', np.float64),
-                ('image', np.uint8, (self.camera.frame_mode.height, self.camera.frame_mode.width, 3))
-            ])
-        )
+        self.frame = np.empty((), dtype=self._get_frame_dtype())
+
+    def get_output_format(self) -> str:
+        '''
+        Layout of the images: rgb, bgr or gray
+        '''
+        return 'bgr' if self.output_format == 'native' else self.output_format
+
+    def _get_frame_dtype(self) -> np.dtype:
+        shape = (self.camera.frame_mode.height, self.camera.frame_mode.width)
+        if self.get_num_channels() > 1:
+            shape += (self.get_num_channels(),)
+        return frame_dtype(np.uint8, shape, self.get_output_format())
 
     def get_mode(self, format_name: str, width: int, height: int, fps: float) -> Optional[CameraMode]:
         for mode in self.camera.available_modes:
@@ -64,23 +90,68 @@ class PyUVC_Webcam(Camera):
 
     def start_acquisition(self):
         self.index = 0
+        if self.mjpeg_decode_threads > 0 and self.decoder is None:
+            mode = self.camera.frame_mode
+            if mode.format_name != 'MJPG':
+                raise ValueError('MJPEG decoding requires an MJPG mode')
+            self.decoder = MJPEGDecoder(
+                self._grab_jpeg, 
+                mode.height, 
+                mode.width, 
+                output_format = self.get_output_format(),
+                num_workers = self.mjpeg_decode_threads
+            )
+            self.decoder.start()
 
     def stop_acquisition(self):
+        if self.decoder is not None:
+            self.decoder.stop()
+            self.decoder = None
         self.camera.close()
 
-    def get_frame(self) -> NDArray:
+    def _grab_jpeg(self):
+        frame = self.camera.get_frame()
+        host_timestamp_ns = time.perf_counter_ns()
+        self.index += 1
+        # the compressed payload, pyuvc does not decode it
+        return (self.index, round(frame.timestamp * 1e9), host_timestamp_ns, bytes(frame.jpeg_buffer))
+
+    def get_frame_into(self, out: NDArray) -> NDArray:
+        if self.decoder is not None:
+            if self.decoder.get_frame_into(out) is None:
+                return None
+            self._update_stats(int(out['index']))
+            return out
+
         frame = self.camera.get_frame()
-        img = frame.rgb
+        host_timestamp_ns = time.perf_counter_ns()
+        # frame.rgb, frame.bgr or frame.gray: pyuvc only computes the one requested
+        img = getattr(frame, self.get_output_format())
         self.index += 1
 
-        self.frame['index'] = self.index
-        self.frame['timestamp'] = frame.timestamp
-        self.frame['image'] = img
+        out['index'] = self.index
+        out['timestamp_ns'] = round(frame.timestamp * 1e9)
+        out['host_timestamp_ns'] = host_timestamp_ns
+        out['image'] = img
+        self._update_stats(self.index)
+        return out
+
+    def get_frame(self) -> NDArray:
+        if self.frame_pool is not None:
+            return self.get_frame_into(self._new_frame(self.frame.dtype))
+
+        if self.decoder is not None:
+            # the decoder's ring already holds the frame
+            frame = self.decoder.get_frame()
+            if frame is not None:
+                self._update_stats(int(frame['index']))
+        else:
+            frame = self.get_frame_into(self.frame)
 
         if self.safe:
-            return self.frame.copy()
+            return frame.copy()
         else:
-            return self.frame
+            return frame
 
     # Exposure / gain controls
     def exposure_available(self) -> bool:
@@ -118,7 +189,7 @@ class PyUVC_Webcam(Camera):
         return self.camera.frame_mode.fps
 
     def get_num_channels(self):
-        return 3
+        return 1 if self.get_output_format() == 'gray' else 3
 
     # ROI
     def ROI_available(self) -> bool:
@@ -216,4 +287,4 @@ class PyUVC_Webcam(Camera):
         return 1.0
 
     def close(self) -> None:
-        ...
\ No newline at end of file
+        super().close()
\ No newline at end of file
@@ -1,11 +1,20 @@
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="v4l2py")
-from v4l2py.device import Device, BufferType 
+from v4l2py.device import (
+    Device, BufferType, BufferFlag, Memory, PixelFormat, VideoCapture, 
+    get_raw_format, iter_video_capture_files, device_number
+)
+import logging
+import select
 import time
+import math
+from dataclasses import dataclass, field
+from functools import reduce
 import numpy as np
-from numpy.typing import NDArray
-from camera_tools.camera import Camera, CameraInfo
-from typing import Optional, Tuple, List
+from numpy.typing import NDArray, DTypeLike
+from camera_tools.camera import Camera, CameraInfo, frame_dtype
+from camera_tools.mjpeg_decoder import MJPEGDecoder
+from typing import Optional, Tuple, List, Dict, Any, Callable
 
 '''
 INFO Useful properties to probe
@@ -16,7 +25,7 @@ d.open()
 d.controls
 d.info
 d.info.formats
-d.info.frame_sizes 
+d.info.frame_types
 (
    d.controls.brightness.minimum, 
    d.controls.brightness.maximum, 
@@ -28,47 +37,311 @@ f = d.get_format(BufferType.VIDEO_CAPTURE)
 (f.width, f.height)
 '''
 
+logger = logging.getLogger(__name__)
+
+# pixel format: (pixel dtype, channels), None for single channel images.
+# Formats missing from this table (compressed, planar) are exposed as flat 
+# byte arrays
+PIXEL_LAYOUTS: Dict[str, Tuple[DTypeLike, Optional[int]]] = {
+    'GREY': (np.uint8, None),
+    'Y16': (np.uint16, None),
+    'YUYV': (np.uint8, 2),
+    'YVYU': (np.uint8, 2),
+    'UYVY': (np.uint8, 2),
+    'VYUY': (np.uint8, 2),
+    'RGB24': (np.uint8, 3),
+    'BGR24': (np.uint8, 3),
+    'RGB32': (np.uint8, 4),
+    'BGR32': (np.uint8, 4),
+    'XRGB32': (np.uint8, 4),
+    'XBGR32': (np.uint8, 4),
+    'ARGB32': (np.uint8, 4),
+    'ABGR32': (np.uint8, 4),
+}
+
+@dataclass
+class MappedFrame:
+    '''
+    Frame whose image is a view of a kernel buffer, valid until requeue
+    hands the buffer back to the driver (also done when leaving a with
+    block). Copy the image to keep it longer.
+    '''
+    index: int
+    timestamp_ns: int
+    host_timestamp_ns: int
+    image: Optional[NDArray]
+    incomplete: bool = False
+    _requeue: Optional[Callable[[], None]] = field(default=None, repr=False)
+
+    def requeue(self) -> None:
+        if self._requeue is not None:
+            self.image = None
+            requeue, self._requeue = self._requeue, None
+            requeue()
+
+    def __enter__(self) -> 'MappedFrame':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.requeue()
+
 class V4L2_Webcam(Camera):
     '''
-    Available on linux only, uses a v4l2 python wrapper 
+    Available on linux only, uses a v4l2 python wrapper.
+    Supported formats, frame sizes and frame intervals are enumerated
+    by the driver (VIDIOC_ENUM_FMT/FRAMESIZES/FRAMEINTERVALS) 
     '''
 
+    SETTINGS = ('pixel_format', 'width', 'height', 'exposure', 'framerate', 'gain')
+
+    # tolerance when matching a requested framerate to the enumerated intervals 
+    FPS_TOLERANCE = 1e-3
+
     @classmethod
     def list_available_cameras(cls) -> List[CameraInfo]:
-        ...
-
-    def __init__(self, cam_id: int = 0, *args, **kwargs) -> None:
+        cam_info = []
+        for filename in iter_video_capture_files():
+            cam_id = device_number(filename)
+            try:
+                with Device(filename) as device:
+                    name = f'{device.info.card} ({filename})'
+            except OSError:
+                # busy or permission denied
+                name = str(filename)
+            cam_info.append(
+                CameraInfo(
+                    name=name,
+                    camera_cls=cls,
+                    args=(),
+                    kwargs={"cam_id": cam_id}
+                )
+            )
+        return cam_info
+
+    def __init__(
+            self, 
+            cam_id: int = 0, 
+            num_buffers: int = 4, 
+            mjpeg_decode_threads: int = 0, 
+            *args, 
+            **kwargs
+        ) -> None:
+        '''
+        num_buffers kernel buffers are mmap'd when acquisition starts: more
+        buffers tolerate longer hiccups of the consumer, at the cost of 
+        latency when frames are not read as fast as they are produced.
+        With mjpeg_decode_threads > 0 and the MJPEG format, frames are
+        decoded on that many threads.
+        '''
         
         super().__init__(*args, **kwargs)
 
         self.camera_id = cam_id
+        self.num_buffers = num_buffers
+        self.mjpeg_decode_threads = mjpeg_decode_threads
+        self.decoder: Optional[MJPEGDecoder] = None
         self.camera = Device.from_id(self.camera_id) 
         self.camera.open()
-        self.index = 0
-        self.time_start = time.perf_counter()
+        self.stream: Optional[VideoCapture] = None
+        self._mapped: Dict[int, MappedFrame] = {}
+        self._load_frame_types()
+
+    def _load_frame_types(self) -> None:
+        # format name: width: height: [FrameType], one FrameType per frame
+        # interval range enumerated by the driver
+        self.supported_configs: Dict[str, Dict[int, Dict[int, List]]] = {}
+        for frame_type in self.camera.info.frame_types:
+            format = PixelFormat(frame_type.pixel_format).name
+            sizes = self.supported_configs.setdefault(format, {})
+            sizes.setdefault(frame_type.width, {}).setdefault(frame_type.height, []).append(frame_type)
+
+    def _frame_types(self, format: str, width: int, height: int) -> List:
+        try:
+            return self.supported_configs[format][width][height]
+        except KeyError:
+            raise ValueError(f'Unsupported config {format} {width}x{height}')
+
+    def _fps_supported(self, frame_types: List, fps: float) -> bool:
+        for frame_type in frame_types:
+            if frame_type.max_fps == 0:
+                # driver did not report frame intervals
+                return True
+            if frame_type.min_fps - self.FPS_TOLERANCE <= fps <= frame_type.max_fps + self.FPS_TOLERANCE:
+                return True
+        return False
+
+    def _set_config(self, format: str, width: int, height: int, fps: Optional[float] = None) -> None:
+        frame_types = self._frame_types(format, width, height)
+        if fps is None:
+            # keep the current framerate if possible, else the fastest
+            fps = self.get_framerate()
+            if not self._fps_supported(frame_types, fps):
+                fps = float(max(frame_type.max_fps for frame_type in frame_types))
+        elif not self._fps_supported(frame_types, fps):
+            raise ValueError(f'Unsupported framerate {fps} for {format} {width}x{height}')
+
+        # the format can't change while buffers are allocated
+        streaming = self.stream is not None
+        if streaming:
+            self.stop_acquisition()
+        self.camera.set_format(BufferType.VIDEO_CAPTURE, width, height, PixelFormat[format])
+        if fps > 0:
+            self.camera.set_fps(BufferType.VIDEO_CAPTURE, fps)
+        if streaming:
+            self.start_acquisition()
+        self.invalidate_capabilities('width', 'height', 'framerate')
+
+    def _get_format(self):
+        return self.camera.get_format(BufferType.VIDEO_CAPTURE)
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        # format, frame size and interval are negotiated together: 
+        # resolve the full config and send it once 
+        current = self._get_format()
+        self._set_config(
+            settings.get('pixel_format', PixelFormat(current.pixel_format).name),
+            settings.get('width', current.width),
+            settings.get('height', current.height),
+            settings.get('framerate')
+        )
+        if 'exposure' in settings:
+            self.set_exposure(settings['exposure'])
+        if 'gain' in settings:
+            self.set_gain(settings['gain'])
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return PixelFormat(self._get_format().pixel_format).name
 
     def start_acquisition(self) -> None:
-        self.camera.close()
-        self.camera = Device.from_id(self.camera_id)
-        self.camera.open()
-        self.index = 0
-        self.time_start = time.perf_counter()
+        if self.stream is not None:
+            return
+        self._image_layout = self._get_image_layout()
+        # request and mmap the kernel buffers, queue them and stream on
+        self.stream = VideoCapture(self.camera, self.num_buffers)
+        self.stream.open()
+        self._start_decoder()
+
+    def _start_decoder(self) -> None:
+        if self.mjpeg_decode_threads < 1:
+            return
+        format = self._get_format()
+        if PixelFormat(format.pixel_format).name != 'MJPEG':
+            raise ValueError('MJPEG decoding requires the MJPEG pixel format')
+        self.decoder = MJPEGDecoder(
+            self._grab_jpeg, 
+            format.height, 
+            format.width, 
+            output_format = 'gray' if self.get_num_channels() == 1 else 'rgb',
+            num_workers = self.mjpeg_decode_threads
+        )
+        self.decoder.start()
+
+    def _grab_jpeg(self):
+        # the compressed payload is small: copy it and requeue the 
+        # kernel buffer right away
+        with self.get_mapped_frame() as mapped:
+            return (mapped.index, mapped.timestamp_ns, mapped.host_timestamp_ns, mapped.image.tobytes())
 
     def stop_acquisition(self) -> None:
-        self.camera.close() 
-    
-    def get_frame(self) -> NDArray:
-        img = next(self.camera.__iter__())
-        pixeldata = np.frombuffer(img.data, dtype=np.uint8)
-        frame = np.array(
-            (img.index, img.timestamp, pixeldata),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', pixeldata.dtype, pixeldata.shape)
-            ])
+        if self.stream is None:
+            return
+        if self.decoder is not None:
+            self.decoder.stop()
+            self.decoder = None
+        # frames still held by the caller are invalidated: buffers are 
+        # returned to the driver by stream off
+        for mapped in self._mapped.values():
+            mapped.image = None
+            mapped._requeue = None
+        self._mapped.clear()
+        try:
+            self.stream.close()
+        except BufferError:
+            logger.warning('image views are still referenced, copy images to keep them after requeue')
+        self.stream = None
+
+    def _get_image_layout(self) -> Tuple[Optional[Tuple[int, ...]], DTypeLike, Tuple[int, ...]]:
+        # shape, dtype and strides of the image in a buffer, shape is None 
+        # for formats without a fixed layout
+        pix = get_raw_format(self.camera.fileno(), BufferType.VIDEO_CAPTURE).fmt.pix
+        layout = PIXEL_LAYOUTS.get(PixelFormat(pix.pixelformat).name)
+        if layout is None:
+            return None, np.uint8, ()
+        dtype, channels = layout
+        itemsize = np.dtype(dtype).itemsize
+        # lines can be padded: rows are bytesperline apart
+        if channels is None:
+            return (pix.height, pix.width), dtype, (pix.bytesperline, itemsize)
+        return (pix.height, pix.width, channels), dtype, (pix.bytesperline, channels*itemsize, itemsize)
+
+    def _wait_buffer(self):
+        if not self.camera.is_blocking:
+            select.select((self.camera,), (), ())
+        return self.stream.dequeue_buffer(Memory.MMAP)
+
+    def _requeue(self, buffer_index: int) -> None:
+        if self._mapped.pop(buffer_index, None) is not None:
+            # bytesused (0) only matters for output buffers
+            self.stream.enqueue_buffer(Memory.MMAP, 0, buffer_index)
+
+    def get_mapped_frame(self) -> MappedFrame:
+        '''
+        Zero-copy access to the next frame: the image is a shaped view of
+        the mmap'd kernel buffer, which is only handed back to the driver
+        by MappedFrame.requeue. Holding more than num_buffers-1 frames 
+        stalls the stream. Not available while frames are decoded on 
+        threads (mjpeg_decode_threads > 0).
+        '''
+        if self.stream is None:
+            self.start_acquisition()
+
+        buffer = self._wait_buffer()
+        host_timestamp_ns = time.perf_counter_ns()
+
+        memory = self.stream.buffer.buffers[buffer.index]
+        shape, dtype, strides = self._image_layout
+        if shape is None:
+            image = np.frombuffer(memory, dtype=np.uint8, count=buffer.bytesused)
+        else:
+            image = np.ndarray(shape, dtype=dtype, buffer=memory, strides=strides)
+
+        mapped = MappedFrame(
+            index = buffer.sequence,
+            timestamp_ns = buffer.timestamp.secs * 1_000_000_000 + buffer.timestamp.usecs * 1000,
+            host_timestamp_ns = host_timestamp_ns,
+            image = image,
+            incomplete = bool(buffer.flags & BufferFlag.ERROR),
+            _requeue = lambda: self._requeue(buffer.index)
         )
-        return frame
+        self._mapped[buffer.index] = mapped
+        self._update_stats(mapped.index, mapped.timestamp_ns, host_timestamp_ns, mapped.incomplete)
+        return mapped
+
+    def get_frame(self) -> NDArray:
+        if self.decoder is not None:
+            if self.frame_pool is not None:
+                return self.get_frame_into(self._new_frame(self.decoder.dtype))
+            # valid until the next call
+            return self.decoder.get_frame()
+
+        with self.get_mapped_frame() as mapped:
+            frame = self._new_frame(frame_dtype(mapped.image.dtype, mapped.image.shape))
+            return self._fill_frame(frame, mapped)
+
+    def get_frame_into(self, out: NDArray) -> NDArray:
+        if self.decoder is not None:
+            return self.decoder.get_frame_into(out)
+
+        with self.get_mapped_frame() as mapped:
+            return self._fill_frame(out, mapped)
+
+    def _fill_frame(self, out: NDArray, mapped: MappedFrame) -> NDArray:
+        # single copy out of the kernel buffer
+        out['index'] = mapped.index
+        out['timestamp_ns'] = mapped.timestamp_ns
+        out['host_timestamp_ns'] = mapped.host_timestamp_ns
+        out['image'] = mapped.image
+        return out
     
     def exposure_available(self) -> bool:
         return self.camera.controls.exposure_time_absolute.is_writeable
@@ -88,21 +361,31 @@ class V4L2_Webcam(Camera):
     def get_exposure_increment(self) -> Optional[float]:
         return self.camera.controls.exposure_time_absolute.step
 
-    # TODO implement that
     def framerate_available(self) -> bool:
-        return False
+        return True
     
     def set_framerate(self, fps: float) -> None:
-        pass
+        current = self._get_format()
+        self._set_config(PixelFormat(current.pixel_format).name, current.width, current.height, fps)
        
     def get_framerate(self) -> Optional[float]:
-        pass
+        return float(self.camera.get_fps(BufferType.VIDEO_CAPTURE))
+
+    def _current_frame_types(self) -> List:
+        current = self._get_format()
+        return self._frame_types(PixelFormat(current.pixel_format).name, current.width, current.height)
 
     def get_framerate_range(self) -> Optional[Tuple[float,float]]:
-        pass
+        frame_types = self._current_frame_types()
+        return (
+            float(min(frame_type.min_fps for frame_type in frame_types)), 
+            float(max(frame_type.max_fps for frame_type in frame_types))
+        )
 
     def get_framerate_increment(self) -> Optional[float]:
-        pass
+        # discrete intervals have no meaningful step
+        steps = [frame_type.step_fps for frame_type in self._current_frame_types() if frame_type.min_fps != frame_type.max_fps]
+        return float(min(steps)) if steps else None
 
     def gain_available(self) -> bool:
         return self.camera.controls.gain.is_writeable
@@ -158,38 +441,89 @@ class V4L2_Webcam(Camera):
     def get_offsetY_increment(self) -> Optional[int]:
         pass
 
+    def _frame_sizes(self) -> List[Tuple[int, int]]:
+        sizes = self.supported_configs[self._get_pixel_format()]
+        return [(width, height) for width in sizes for height in sizes[width]]
+
+    def _set_frame_size(self, width: int, height: int) -> None:
+        self._set_config(self._get_pixel_format(), width, height)
+
     def width_available(self) -> bool:
-        return False
+        return True
 
     def set_width(self, width: int) -> None:
-        pass
+        # keep the height if the driver supports it, else the closest one 
+        heights = [h for w, h in self._frame_sizes() if w == width]
+        if not heights:
+            raise ValueError(f'Unsupported width {width}')
+        height = self.get_height()
+        self._set_frame_size(width, min(heights, key=lambda h: abs(h - height)))
 
     def get_width(self) -> Optional[int]:
-        pass
+        return self._get_format().width
 
-    def get_width_range(self) -> Optional[int]:
-        pass
+    def get_width_range(self) -> Optional[Tuple[int,int]]:
+        widths = [w for w, h in self._frame_sizes()]
+        return (min(widths), max(widths))
 
     def get_width_increment(self) -> Optional[int]:
-        pass 
+        return reduce(math.gcd, [w for w, h in self._frame_sizes()])
 
     def height_available(self) -> bool:
-        return False
+        return True
 
     def set_height(self, height) -> None:
-        pass
+        widths = [w for w, h in self._frame_sizes() if h == height]
+        if not widths:
+            raise ValueError(f'Unsupported height {height}')
+        width = self.get_width()
+        self._set_frame_size(min(widths, key=lambda w: abs(w - width)), height)
     
     def get_height(self) -> Optional[int]:
-        pass    
+        return self._get_format().height
     
-    def get_height_range(self) -> Optional[int]:
-        pass
+    def get_height_range(self) -> Optional[Tuple[int,int]]:
+        heights = [h for w, h in self._frame_sizes()]
+        return (min(heights), max(heights))
 
     def get_height_increment(self) -> Optional[int]:
-        pass 
+        return reduce(math.gcd, [h for w, h in self._frame_sizes()])
 
     def get_num_channels(self):
-        return 3
+        layout = PIXEL_LAYOUTS.get(self._get_pixel_format())
+        if layout is None:
+            # compressed formats decode to colour
+            return 3
+        return layout[1] or 1
     
     def close(self) -> None:
-        ...
\ No newline at end of file
+        self.stop_acquisition()
+        self.camera.close()
+        super().close()
+
+class V4L2_Webcam_Gray(V4L2_Webcam):
+    '''
+    Grayscale frames without colour conversion: the luma plane of packed 
+    YUV 4:2:2 formats is a strided view of the kernel buffer, copied once
+    into the frame. GREY is used as is, MJPEG is decoded to luma only 
+    (requires mjpeg_decode_threads > 0).
+    '''
+
+    # byte holding the luma of each (Y, chroma) pair
+    LUMA_CHANNEL = {'YUYV': 0, 'YVYU': 0, 'UYVY': 1, 'VYUY': 1}
+
+    def start_acquisition(self) -> None:
+        format = self._get_pixel_format()
+        if format not in self.LUMA_CHANNEL and format != 'GREY' and not (format == 'MJPEG' and self.mjpeg_decode_threads > 0):
+            raise ValueError(f'No luma plane in {format} frames')
+        self._luma_channel = self.LUMA_CHANNEL.get(format)
+        super().start_acquisition()
+
+    def get_mapped_frame(self) -> MappedFrame:
+        mapped = super().get_mapped_frame()
+        if self._luma_channel is not None:
+            mapped.image = mapped.image[:, :, self._luma_channel]
+        return mapped
+
+    def get_num_channels(self):
+        return 1
@@ -1,8 +1,9 @@
-from camera_tools.camera import Camera, CameraInfo
-from typing import Optional, Tuple, List
+from camera_tools.camera import Camera, CameraInfo, frame_dtype
+from typing import Optional, Tuple, List, Dict, Any
 from ximea import xiapi
 from numpy.typing import NDArray
 import numpy as np
+import time
 
 #  CMV4000
 # sensor_freq = 48_000_000
@@ -17,6 +18,9 @@ import numpy as np
 
 class XimeaCamera(Camera):
 
+    SETTINGS = Camera.SETTINGS + ('pixel_format', 'binning')
+    PIXEL_FORMATS = ('XI_RAW8', 'XI_MONO8', 'XI_RAW16', 'XI_MONO16')
+
     @classmethod
     def list_available_cameras(cls) -> List[CameraInfo]:
         n_cam = xiapi.Camera().get_number_devices()
@@ -43,6 +47,7 @@ class XimeaCamera(Camera):
         self.first_frame = True
         self.first_num = 0
         self.first_timestamp = 0
+        self.acquisition_started = False
 
         # open camera
         self.xi_cam = xiapi.Camera(dev_id)
@@ -74,9 +79,42 @@ class XimeaCamera(Camera):
         
     def start_acquisition(self) -> None:
         self.xi_cam.start_acquisition()
+        self.acquisition_started = True
     
     def stop_acquisition(self) -> None:
         self.xi_cam.stop_acquisition()
+        self.acquisition_started = False
+
+    def _set_pixel_format(self, pixel_format: str) -> None:
+        if pixel_format not in self.PIXEL_FORMATS:
+            raise ValueError(f'Unsupported pixel format {pixel_format}')
+        self.xi_cam.set_imgdataformat(pixel_format)
+        self.invalidate_capabilities()
+
+    def _get_pixel_format(self) -> Optional[str]:
+        return self.xi_cam.get_imgdataformat()
+
+    def _set_binning(self, horizontal: int, vertical: int) -> None:
+        try:
+            self.xi_cam.set_binning_horizontal(horizontal)
+            self.xi_cam.set_binning_vertical(vertical)
+        except xiapi.Xi_error as e:
+            print(f"Could not set binning: {e}")
+        self.invalidate_capabilities()
+
+    def _get_binning(self) -> Optional[Tuple[int, int]]:
+        return (self.xi_cam.get_binning_horizontal(), self.xi_cam.get_binning_vertical())
+
+    def _apply_settings(self, settings: Dict[str, Any]) -> None:
+        # image format and size can't change while acquiring
+        restart = self.acquisition_started and any(
+            name in settings for name in self.LAYOUT_SETTINGS
+        )
+        if restart:
+            self.stop_acquisition()
+        super()._apply_settings(settings)
+        if restart:
+            self.start_acquisition()
 
     def exposure_available(self) -> bool:
         return True
@@ -162,17 +200,16 @@ class XimeaCamera(Camera):
         pass
 
     def set_offsetX(self, offsetX: int) -> None:
-        offsetX_min, offsetX_max = self.get_offsetX_range()
-        offsetX_inc = self.get_offsetX_increment()
+        clamped_offsetX = self.get_capabilities().clamp('offsetX', offsetX)
 
-        closest_valid_offsetX = round(offsetX/offsetX_inc)*offsetX_inc
-        clamped_offsetX = max(offsetX_min, min(offsetX_max, closest_valid_offsetX))
-    
         try:
             self.xi_cam.set_offsetX(int(clamped_offsetX))
         except xiapi.Xi_error:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('width')
+
     def offsetX_available(self) -> bool:
         return True
     
@@ -188,17 +225,16 @@ class XimeaCamera(Camera):
         return self.xi_cam.get_offsetX_increment()
 
     def set_offsetY(self, offsetY: int) -> None:
-        offsetY_min, offsetY_max = self.get_offsetY_range()
-        offsetY_inc = self.get_offsetY_increment()
-
-        closest_valid_offsetY = round(offsetY/offsetY_inc)*offsetY_inc
-        clamped_offsetY = max(offsetY_min, min(offsetY_max, closest_valid_offsetY))
+        clamped_offsetY = self.get_capabilities().clamp('offsetY', offsetY)
 
         try:
             self.xi_cam.set_offsetY(int(clamped_offsetY))
         except xiapi.Xi_error:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('height')
+
     def offsetY_available(self) -> bool:
         return True
     
@@ -217,17 +253,16 @@ class XimeaCamera(Camera):
         return True
     
     def set_width(self, width: int) -> None:
-        width_min, width_max = self.get_width_range()
-        width_inc = self.get_width_increment()
+        clamped_width = self.get_capabilities().clamp('width', width)
 
-        closest_valid_width = round(width/width_inc)*width_inc
-        clamped_width = max(width_min, min(width_max, closest_valid_width))
-        
         try:
             self.xi_cam.set_width(int(clamped_width))
         except xiapi.Xi_error:
             pass
 
+        # ranges depending on this parameter
+        self.invalidate_capabilities('offsetX', 'framerate')
+
     def get_width(self) -> Optional[int]:
         return self.xi_cam.get_width()
 
@@ -243,16 +278,15 @@ class XimeaCamera(Camera):
         return True
     
     def set_height(self, height: int) -> None:
-        height_min, height_max = self.get_height_range()
-        height_inc = self.get_height_increment()
+        clamped_height = self.get_capabilities().clamp('height', height)
 
-        closest_valid_height = round(height/height_inc)*height_inc
-        clamped_height = max(height_min, min(height_max, closest_valid_height))
-        
         try:
             self.xi_cam.set_height(int(clamped_height))
         except xiapi.Xi_error:
-                pass
+            pass
+
+        # ranges depending on this parameter
+        self.invalidate_capabilities('offsetY', 'framerate')
         
     def get_height(self) -> Optional[int]:
         return self.xi_cam.get_height()    
@@ -265,27 +299,41 @@ class XimeaCamera(Camera):
     def get_height_increment(self) -> Optional[int]:
         return self.xi_cam.get_height_increment()
 
-    def get_frame(self) -> NDArray:
-        self.xi_cam.get_image(self.xi_img)
-        pixeldata = self.xi_img.get_image_data_numpy()
+    def _get_pixeldata(self) -> NDArray:
+        return self.xi_img.get_image_data_numpy()
+
+    def _fill_frame(self, out: NDArray, pixeldata: NDArray) -> NDArray:
+        host_timestamp_ns = time.perf_counter_ns()
         im_num = self.xi_img.acq_nframe
         ts_sec = self.xi_img.tsSec
         ts_usec = self.xi_img.tsUSec
-        timestamp = (ts_sec*1_000_000 +  ts_usec)/1_000_000
+        timestamp_ns = ts_sec*1_000_000_000 + ts_usec*1_000
         if self.first_frame:
             self.first_frame = False
             self.first_num = im_num
-            self.first_timestamp = timestamp
-
-        frame = np.array(
-            (im_num-self.first_num, timestamp-self.first_timestamp, pixeldata),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', pixeldata.dtype, pixeldata.shape)
-            ])
+            self.first_timestamp = timestamp_ns
+
+        out['index'] = im_num-self.first_num
+        out['timestamp_ns'] = timestamp_ns-self.first_timestamp
+        out['host_timestamp_ns'] = host_timestamp_ns
+        out['image'] = pixeldata
+
+        self._update_stats(
+            im_num-self.first_num, 
+            timestamp_ns-self.first_timestamp, 
+            host_timestamp_ns
         )
-        return frame
+        return out
+
+    def get_frame(self) -> NDArray:
+        self.xi_cam.get_image(self.xi_img)
+        pixeldata = self._get_pixeldata()
+        frame = self._new_frame(frame_dtype(pixeldata.dtype, pixeldata.shape))
+        return self._fill_frame(frame, pixeldata)
+
+    def get_frame_into(self, out: NDArray) -> NDArray:
+        self.xi_cam.get_image(self.xi_img)
+        return self._fill_frame(out, self._get_pixeldata())
 
     def get_num_channels(self):
         # TODO  imgdataformat = cam.get_imgdataformat()
@@ -295,6 +343,7 @@ class XimeaCamera(Camera):
         if self.xi_cam is not None:
             self.xi_cam.close_device()
         self.xi_cam = None
+        super().close()
 
     def __del__(self):
         try:
@@ -319,9 +368,7 @@ class XimeaCamera_Transport(XimeaCamera):
         self.xi_cam.set_imgdataformat('XI_FRM_TRANSPORT_DATA')
         self.image_holder = numpy_holder()
 
-    def get_frame(self) -> NDArray:
-
-        self.xi_cam.get_image(self.xi_img)
+    def _get_pixeldata(self) -> NDArray:
 
         buffer = {
             'data': (self.xi_img.bp, False),
@@ -332,23 +379,4 @@ class XimeaCamera_Transport(XimeaCamera):
             'version': 3
         }
         self.image_holder.__array_interface__ = buffer
-        pixeldata = np.array(self.image_holder, copy=False)
-        
-        im_num = self.xi_img.acq_nframe
-        ts_sec = self.xi_img.tsSec
-        ts_usec = self.xi_img.tsUSec
-        timestamp = (ts_sec*1_000_000 +  ts_usec)/1_000_000
-        if self.first_frame:
-            self.first_frame = False
-            self.first_num = im_num
-            self.first_timestamp = timestamp
-
-        frame = np.array(
-            (im_num-self.first_num, timestamp-self.first_timestamp, pixeldata),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', pixeldata.dtype, pixeldata.shape)
-            ])
-        )
-        return frame
\ No newline at end of file
+        return np.array(self.image_holder, copy=False)
@@ -1,4 +1,5 @@
-from camera_tools.camera import Camera, CameraInfo
+from camera_tools.camera import Camera, CameraInfo, FrameBatch, frame_dtype
+from camera_tools.frame_pacer import FramePacer
 import time
 import numpy as np
 from numpy.typing import NDArray, ArrayLike
@@ -33,33 +34,60 @@ class ZeroCam(Camera):
         super().__init__(*args, **kwargs)
 
         self.img_count: int = 0
-        self.time_start: float = time.perf_counter()
+        self.time_start_ns: int = time.perf_counter_ns()
         self.shape = np.asarray(shape) 
         self.dtype = np.dtype(dtype)
-        self.framerate = self.DEFAULT_FPS
+        self.pacer = FramePacer(self.DEFAULT_FPS)
 
     def start_acquisition(self) -> None:
         self.index = 0
-        self.time_start = time.perf_counter()
+        self.time_start_ns = time.perf_counter_ns()
+        self.pacer.reset()
 
     def stop_acquisition(self) -> None:
         pass
 
     def get_frame(self) -> NDArray:
 
-        timestamp = time.perf_counter() - self.time_start
+        frame = self._new_frame(self._get_frame_dtype())
+        return self.get_frame_into(frame)
+
+    def _get_frame_dtype(self) -> np.dtype:
+        if self._frame_dtype is None:
+            self._frame_dtype = frame_dtype(self.dtype, tuple(self.shape))
+        return self._frame_dtype
+
+    def get_frame_into(self, out: NDArray) -> NDArray:
+
+        out['image'].fill(0)
+        # the schedule plays the role of the device clock
+        deadline_ns = self.pacer.wait()
+        host_timestamp_ns = time.perf_counter_ns()
         self.img_count += 1
-        img = np.zeros(self.shape, dtype=self.dtype)
-        frame = np.array(
-            (self.img_count, timestamp, img),
-            dtype = np.dtype([
-                ('index', int),
-                ('timestamp', np.float32),
-                ('image', self.dtype, self.shape)
-            ])
-        )
-        time.sleep(max(0, 1/self.framerate - (time.perf_counter() - timestamp)))
-        return frame
+        out['index'] = self.img_count
+        out['timestamp_ns'] = deadline_ns - self.time_start_ns
+        out['host_timestamp_ns'] = host_timestamp_ns
+        self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
+        return out
+
+    def get_frames(self, num_frames: int, out: Optional[FrameBatch] = None) -> FrameBatch:
+
+        if out is None:
+            out = FrameBatch.empty(num_frames, self._get_frame_dtype())
+        elif len(out) < num_frames:
+            raise ValueError(f'FrameBatch too small for {num_frames} frames')
+
+        out.image[:num_frames] = 0
+        for i in range(num_frames):
+            deadline_ns = self.pacer.wait()
+            host_timestamp_ns = time.perf_counter_ns()
+            self.img_count += 1
+            out.index[i] = self.img_count
+            out.timestamp_ns[i] = deadline_ns - self.time_start_ns
+            out.host_timestamp_ns[i] = host_timestamp_ns
+            self._update_stats(self.img_count, deadline_ns, host_timestamp_ns)
+        
+        return out[:num_frames]
     
     def exposure_available(self) -> bool:
         return False
@@ -80,13 +108,13 @@ class ZeroCam(Camera):
         return True
     
     def set_framerate(self, fps: float) -> None:
-        self.framerate = fps
+        self.pacer.set_framerate(fps)
     
     def get_framerate(self) -> Optional[float]:
-        return self.framerate
+        return self.pacer.fps
 
     def get_framerate_range(self) -> Optional[Tuple[float,float]]:
-        return (1,1000)
+        return (0,1000)
 
     def get_framerate_increment(self) -> Optional[float]:
         return 1
@@ -150,6 +178,7 @@ class ZeroCam(Camera):
     
     def set_width(self, width: int) -> None:
         self.shape[1] = width
+        self.invalidate_frame_dtype()
 
     def get_width(self) -> Optional[int]:
         return self.shape[1]
@@ -165,6 +194,7 @@ class ZeroCam(Camera):
     
     def set_height(self, height) -> None:
         self.shape[0] = height
+        self.invalidate_frame_dtype()
     
     def get_height(self) -> Optional[int]:
         return self.shape[0]    
@@ -183,4 +213,4 @@ class ZeroCam(Camera):
         return num_channels
     
     def close(self) -> None:
-        ...
\ No newline at end of file
+        super().close()
\ No newline at end of file
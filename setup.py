@@ -5,7 +5,7 @@ setup(
     python_requires='>=3.8',
     author='Martin Privat',
     version='0.8.16',
-    packages=['camera_tools'],
+    packages=['camera_tools', 'camera_tools.benchmark'],
     license='Creative Commons Attribution-Noncommercial-Share Alike license',
     description='camera tools',
     long_description=open('README.md').read(),
@@ -13,7 +13,7 @@ setup(
         "numpy", 
         "qtpy",
         "opencv-python-headless",
-        "v4l2py",
+        "v4l2py>=3.0",
         "video_tools @ git+https://github.com/ElTinmar/video_tools.git@v0.6.11",
         "qt_widgets @ git+https://github.com/ElTinmar/qt_widgets.git@v0.5.4"
     ]
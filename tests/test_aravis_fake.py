@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+gi = pytest.importorskip('gi')
+try:
+    gi.require_version('Aravis', '0.10')
+    from gi.repository import Aravis
+except (ValueError, ImportError):
+    pytest.skip('Aravis 0.10 not available', allow_module_level=True)
+
+from camera_tools.aravis import AravisCamera
+from camera_tools.benchmark.aravis_fake import open_fake_camera, bench_starvation
+
+@pytest.fixture
+def camera():
+    camera = open_fake_camera()
+    yield camera
+    camera.close()
+
+def test_open_fake_camera(camera):
+    assert camera.dev_id == 'Fake_1'
+    assert camera.is_fake()
+    names = [info.name for info in AravisCamera.list_available_cameras(include_fake=True)]
+    assert 'Fake_1' in names
+
+def test_get_frame(camera):
+    camera.start_acquisition()
+    frame = camera.get_frame()
+    camera.stop_acquisition()
+
+    assert frame['image'].shape == (camera.get_height(), camera.get_width())
+    assert frame['image'].dtype == np.uint8
+    assert frame.dtype.names == ('index', 'timestamp_ns', 'host_timestamp_ns', 'image')
+
+def test_ROI_change_reallocates_buffers(camera):
+    stream = camera.stream
+    width = camera.get_width() // 2
+    height = camera.get_height() // 2
+
+    camera.set_ROI(0, 0, width, height)
+
+    assert camera.stream is not stream
+    assert camera.cam.get_payload() == width * height
+    camera.start_acquisition()
+    frame = camera.get_frame()
+    camera.stop_acquisition()
+    assert frame['image'].shape == (height, width)
+
+def test_buffer_starvation_counters():
+    # two buffers at 100 fps, consumed at 20 fps: the fake camera runs out
+    # of buffers between reads
+    result, = bench_starvation([2], consumer_delay_s=0.05, framerate=100, num_frames=10)
+
+    assert result['num_buffers'] == 2
+    assert result['delivered'] == 10
+    assert result['stream_underruns'] > 0
+    assert result['stream_failures'] == 0
+
+def test_frame_callback_survives_reallocation(camera):
+    calls = []
+    camera._connect_frame_callback(lambda: calls.append(1))
+    stream = camera.stream
+
+    camera.set_ROI(0, 0, camera.get_width() // 2, camera.get_height() // 2)
+
+    assert camera.stream is not stream
+    assert camera.frame_callback_id is not None
+    camera.start_acquisition()
+    camera.get_frame()
+    camera.stop_acquisition()
+    camera._disconnect_frame_callback()
+    assert calls
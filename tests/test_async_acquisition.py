@@ -0,0 +1,55 @@
+import asyncio
+import gc
+import threading
+import pytest
+
+from camera_tools.zerocam import ZeroCam
+
+@pytest.fixture
+def camera():
+    camera = ZeroCam(shape=(4, 4), dtype='uint8')
+    camera.set_framerate(0)
+    camera.start_acquisition()
+    yield camera
+    camera.close()
+
+def test_aframes(camera):
+    async def main():
+        indices = []
+        frames = camera.aframes()
+        async for frame in frames:
+            indices.append(int(frame['index']))
+            if len(indices) == 3:
+                break
+        await frames.aclose()
+        return indices, frames.thread
+
+    indices, thread = asyncio.run(main())
+    assert indices == [1, 2, 3]
+    assert thread is None
+
+def test_break_stops_acquisition_thread(camera):
+    threads = set(threading.enumerate())
+
+    async def main():
+        async for frame in camera.aframes():
+            if frame['index'] == 3:
+                break
+        gc.collect()
+
+    asyncio.run(main())
+
+    # the thread notices the stop event within a poll interval
+    for thread in set(threading.enumerate()) - threads:
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+
+def test_close_shuts_down_aget_frame_executor(camera):
+    async def main():
+        return await camera.aget_frame()
+
+    assert asyncio.run(main())['index'] == 1
+    executor = camera._executor
+    camera.close()
+    assert camera._executor is None
+    assert executor._shutdown
@@ -0,0 +1,48 @@
+import gc
+import threading
+import pytest
+
+from camera_tools.zerocam import ZeroCam
+
+@pytest.fixture
+def camera():
+    camera = ZeroCam(shape=(4, 4), dtype='uint8')
+    camera.set_framerate(0)
+    camera.start_acquisition()
+    yield camera
+    camera.close()
+
+def prefetch_threads():
+    return [thread for thread in threading.enumerate() if thread.daemon and thread.is_alive()]
+
+def test_break_takes_no_extra_frame(camera):
+    threads = prefetch_threads()
+
+    for frame in camera:
+        if frame['index'] == 3:
+            break
+
+    assert camera.get_frame()['index'] == 4
+    assert prefetch_threads() == threads
+
+def test_prefetch_stops_on_close(camera):
+    threads = prefetch_threads()
+
+    with camera.frames(prefetch=2) as frames:
+        indices = [int(next(frames)['index']) for _ in range(3)]
+
+    assert indices == [1, 2, 3]
+    assert prefetch_threads() == threads
+
+def test_dropped_prefetching_iterator_stops(camera):
+    threads = prefetch_threads()
+
+    for frame in camera.frames(prefetch=2):
+        if frame['index'] == 3:
+            break
+    gc.collect()
+
+    # the thread notices the stop event within a poll interval
+    for thread in set(prefetch_threads()) - set(threads):
+        thread.join(timeout=1)
+    assert prefetch_threads() == threads
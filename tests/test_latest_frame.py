@@ -0,0 +1,49 @@
+import threading
+import pytest
+
+from camera_tools.zerocam import ZeroCam
+from camera_tools.latest_frame import LatestFrameCamera
+
+class BlockingCam(ZeroCam):
+    '''
+    Blocks after two frames until acquisition is stopped, like Aravis or
+    Spinnaker without new frames
+    '''
+
+    def start_acquisition(self) -> None:
+        super().start_acquisition()
+        self.stopped = threading.Event()
+
+    def stop_acquisition(self) -> None:
+        self.stopped.set()
+
+    def get_frame_into(self, out):
+        if self.img_count >= 2:
+            self.stopped.wait()
+            raise RuntimeError('acquisition stopped')
+        return super().get_frame_into(out)
+
+@pytest.fixture
+def camera():
+    camera = BlockingCam(shape=(4, 4), dtype='uint8')
+    camera.set_framerate(0)
+    return LatestFrameCamera(camera, timeout=1)
+
+def test_latest_frame(camera):
+    camera.start_acquisition()
+    frame = camera.get_frame()
+    camera.close()
+
+    assert frame['index'] in (1, 2)
+
+def test_stop_unblocks_the_grab_thread(camera):
+    camera.start_acquisition()
+    camera.get_frame()
+    thread = camera.grabber.thread
+
+    camera.stop_acquisition()
+
+    assert not thread.is_alive()
+    # the read interrupted by stopping is not an error
+    assert camera.grabber.exception is None
+    camera.close()
@@ -0,0 +1,157 @@
+import mmap
+from collections import deque
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import pytest
+
+pytest.importorskip('v4l2py')
+
+from v4l2py.device import BufferType, Memory, PixelFormat
+from camera_tools import webcam_v4l2
+from camera_tools.webcam_v4l2 import V4L2_Webcam
+
+WIDTH = 4
+HEIGHT = 2
+BUFFER_SIZE = 4096
+
+class MemoryCapture(webcam_v4l2.VideoCapture):
+    '''
+    Anonymous mmaps in place of the kernel buffers, queueing goes through
+    the device like with the real buffers
+    '''
+
+    def open(self):
+        self.buffer = SimpleNamespace(
+            buffers = [mmap.mmap(-1, BUFFER_SIZE) for _ in range(self.size)]
+        )
+
+    def close(self):
+        for memory in self.buffer.buffers:
+            memory.close()
+        self.buffer = None
+
+def gray_payload(seq):
+    return bytes([seq % 256]) * (WIDTH*HEIGHT)
+
+def fake_device(num_buffers, pixel_format, payload):
+    # driver side queue of buffer indices, each dequeued buffer is filled
+    # with payload(sequence number)
+    queue = deque(range(num_buffers))
+    sequence = iter(range(1_000_000))
+    capture = {}
+
+    def dequeue_buffer(buffer_type, memory):
+        index = queue.popleft()
+        seq = next(sequence)
+        data = payload(seq)
+        capture['stream'].buffer.buffers[index][:len(data)] = data
+        return SimpleNamespace(
+            index = index,
+            sequence = seq,
+            bytesused = len(data),
+            flags = 0,
+            timestamp = SimpleNamespace(secs=seq, usecs=0)
+        )
+
+    def enqueue_buffer(buffer_type, memory, size, index):
+        queue.append(index)
+
+    device = mock.MagicMock()
+    device.info.frame_types = []
+    device.is_blocking = True
+    device.dequeue_buffer.side_effect = dequeue_buffer
+    device.enqueue_buffer.side_effect = enqueue_buffer
+    device.get_format.return_value = SimpleNamespace(
+        pixel_format = pixel_format,
+        width = WIDTH,
+        height = HEIGHT
+    )
+    return device, queue, capture
+
+def open_camera(monkeypatch, pixel_format=PixelFormat.GREY, payload=gray_payload, **kwargs):
+    num_buffers = 2
+    device, queue, capture = fake_device(num_buffers, pixel_format, payload)
+
+    def video_capture(device, size):
+        capture['stream'] = MemoryCapture(device, size)
+        return capture['stream']
+
+    pix = SimpleNamespace(
+        pixelformat = pixel_format,
+        width = WIDTH,
+        height = HEIGHT,
+        bytesperline = WIDTH
+    )
+    monkeypatch.setattr(webcam_v4l2.Device, 'from_id', lambda cam_id: device)
+    monkeypatch.setattr(webcam_v4l2, 'VideoCapture', video_capture)
+    monkeypatch.setattr(
+        webcam_v4l2,
+        'get_raw_format',
+        lambda fd, buffer_type: SimpleNamespace(fmt=SimpleNamespace(pix=pix))
+    )
+
+    camera = V4L2_Webcam(num_buffers=num_buffers, **kwargs)
+    return camera, device, queue
+
+@pytest.fixture
+def camera(monkeypatch):
+    camera, device, queue = open_camera(monkeypatch)
+    yield camera, device, queue
+    camera.close()
+
+def test_requeue_through_device(camera):
+    camera, device, queue = camera
+
+    with camera.get_mapped_frame() as mapped:
+        assert mapped.index == 0
+        assert len(queue) == 1
+
+    device.enqueue_buffer.assert_called_once_with(BufferType.VIDEO_CAPTURE, Memory.MMAP, 0, 0)
+    assert list(queue) == [1, 0]
+
+def test_more_frames_than_buffers(camera):
+    camera, device, queue = camera
+
+    frames = [camera.get_frame() for _ in range(5)]
+
+    assert [frame['index'] for frame in frames] == list(range(5))
+    for frame in frames:
+        assert frame['image'].shape == (HEIGHT, WIDTH)
+        assert np.all(frame['image'] == frame['index'])
+    assert device.enqueue_buffer.call_count == 5
+
+def test_held_frame_is_requeued_once(camera):
+    camera, device, queue = camera
+
+    mapped = camera.get_mapped_frame()
+    mapped.requeue()
+    mapped.requeue()
+
+    assert mapped.image is None
+    assert device.enqueue_buffer.call_count == 1
+
+def test_get_frames_through_decoder(monkeypatch):
+    cv2 = pytest.importorskip('cv2')
+
+    def jpeg_payload(seq):
+        image = np.full((HEIGHT, WIDTH, 3), 10*seq, dtype=np.uint8)
+        ok, jpeg = cv2.imencode('.jpg', image)
+        return jpeg.tobytes()
+
+    camera, device, queue = open_camera(
+        monkeypatch,
+        pixel_format = PixelFormat.MJPEG,
+        payload = jpeg_payload,
+        mjpeg_decode_threads = 1
+    )
+    try:
+        camera.start_acquisition()
+        batch = camera.get_frames(4)
+    finally:
+        camera.close()
+
+    assert batch.index.tolist() == [0, 1, 2, 3]
+    assert batch.image.shape == (4, HEIGHT, WIDTH, 3)
+    for seq, image in zip(batch.index, batch.image):
+        assert np.abs(image.astype(int) - 10*seq).max() <= 2